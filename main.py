@@ -1,17 +1,193 @@
 import os
+import re
+import sys
+import json
+import asyncio
+import threading
+import importlib
 import glob
 import shutil
-from dotenv import load_dotenv
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 
-# Import script processing functions
-from script_repurposer import build_personality_db, repurpose_script, analyze_script_only, repurpose_from_analyzed, DB_PATH
-from video_processor import process_video, scenes_to_script, transcribe_only
-
-# === Load API Key ===
-load_dotenv()
+# Import script processing functions (this also loads .env)
+from script_repurposer import build_personality_db, load_db, repurpose_script, prefetch_structure, analyze_script_only, repurpose_from_analyzed, DB_PATH
 
 # === Helper Functions ===
 
+VIDEOS_FOLDER = "videos"
+_VIDEO_RE = re.compile(r'\.(mp4|mov|avi|mkv|webm)$', re.IGNORECASE)
+VIDEOS_CACHE_PATH = ".videos_cache.json"
+RAW_SCRIPTS_DIR = "raw_scripts"
+ANALYZED_SCRIPTS_DIR = "analyzed_scripts"
+
+
+@functools.lru_cache(maxsize=None)
+def list_videos(folder: str = VIDEOS_FOLDER) -> tuple:
+    """
+    List video files in a folder with a single directory scan, sorted so the
+    menu numbering is stable. Cached so the folder is only scanned once per session.
+
+    Across sessions, the listing is kept in VIDEOS_CACHE_PATH keyed by the
+    folder's mtime, which changes whenever files are added, removed, or renamed.
+    The folder is only rescanned when that mtime changes.
+
+    Args:
+        folder: Directory to scan for videos
+
+    Returns:
+        Tuple of video file paths (empty if the folder doesn't exist)
+    """
+    try:
+        dir_mtime = os.stat(folder).st_mtime_ns
+    except FileNotFoundError:
+        return ()
+
+    cache = {}
+    if os.path.exists(VIDEOS_CACHE_PATH):
+        try:
+            with open(VIDEOS_CACHE_PATH, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            cache = {}
+
+    entry = cache.get(folder)
+    if entry and entry.get("mtime") == dir_mtime:
+        return tuple(entry["files"])
+
+    with os.scandir(folder) as it:
+        video_files = sorted(e.path for e in it if e.is_file() and _VIDEO_RE.search(e.name))
+
+    # Stored outside the videos folder so writing it doesn't bump the folder's mtime
+    cache[folder] = {"mtime": dir_mtime, "files": video_files}
+    try:
+        with open(VIDEOS_CACHE_PATH, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+    except OSError:
+        pass
+
+    return tuple(video_files)
+
+
+def pick_index(selection: str, count: int):
+    """
+    Parse a 1-based menu selection.
+    
+    Args:
+        selection: User input
+        count: Number of items in the menu
+        
+    Returns:
+        0-based index, or None if the selection isn't a valid item number
+    """
+    try:
+        index = int(selection) - 1
+    except ValueError:
+        return None
+    return index if 0 <= index < count else None
+
+
+def select_video(folder: str = VIDEOS_FOLDER) -> str:
+    """
+    List available videos and prompt the user to pick one (or enter a custom path).
+
+    Args:
+        folder: Directory to look for videos in
+
+    Returns:
+        Selected video path
+    """
+    if not os.path.isdir(folder):
+        print(f"\n💡 Tip: Create a '{folder}/' folder to see video list")
+        return input("Enter path to video file: ").strip()
+
+    video_files = list_videos(folder)
+    if not video_files:
+        print(f"\n⚠️  No videos found in {folder}/ folder")
+        return input("Enter path to video file: ").strip()
+
+    print(f"\n📹 Found {len(video_files)} video(s) in {folder}/ folder:")
+    print("-" * 60)
+    for i, video in enumerate(video_files, 1):
+        filename = os.path.basename(video)
+        print(f"{i}. {filename}")
+
+    print("-" * 60)
+    selection = input(f"\nSelect video (1-{len(video_files)}) or enter custom path: ").strip()
+
+    # Check if it's a number selection
+    index = pick_index(selection, len(video_files))
+    if index is not None:
+        return video_files[index]
+    # Custom path
+    return selection
+
+
+def select_from_folder(folder: str, pattern: str, label: str, prompt: str, tip: str):
+    """
+    List files matching a pattern in a folder and prompt the user to pick one.
+    
+    Args:
+        folder: Directory to list
+        pattern: Glob pattern for the files (e.g. "*.txt")
+        label: What the files are, for messages (e.g. "raw script")
+        prompt: Selection prompt shown to the user
+        tip: What to do first if the folder is missing or empty
+        
+    Returns:
+        Selected file path, or None if nothing was selected
+    """
+    if not os.path.exists(folder):
+        print(f"\n⚠️  {folder}/ folder not found")
+        print(f"💡 Tip: {tip} to create the folder")
+        return None
+    
+    files = glob.glob(os.path.join(folder, pattern))
+    if not files:
+        print(f"\n⚠️  No {label}s found in {folder}/ folder")
+        print(f"💡 Tip: {tip} to create {label}s")
+        return None
+    
+    print(f"\n📝 Found {len(files)} {label}(s):")
+    print("-" * 60)
+    for i, file_path in enumerate(files, 1):
+        filename = os.path.basename(file_path)
+        print(f"{i}. {filename}")
+    
+    print("-" * 60)
+    selection = input(f"\n{prompt} (1-{len(files)}): ").strip()
+    
+    index = pick_index(selection, len(files))
+    if index is None:
+        print("Invalid selection")
+        return None
+    return files[index]
+
+
+def select_raw_script(prompt: str):
+    """Prompt the user to pick a script from raw_scripts/ (None if nothing was selected)."""
+    return select_from_folder(
+        RAW_SCRIPTS_DIR,
+        "*.txt",
+        label="raw script",
+        prompt=prompt,
+        tip="Process a video first (option 1 or 2)",
+    )
+
+
+def fast_copy(src: str, dst: str):
+    """
+    Copy src to dst in the kernel (shutil.copyfile uses sendfile on Linux)
+    rather than through Python buffers like shutil.copy.
+
+    Args:
+        src: Source file path
+        dst: Destination file path (replaced if it exists)
+    """
+    shutil.copyfile(src, dst)
+
+
 def get_extra_instructions() -> str:
     """
     Prompt user for optional extra instructions for script repurposing.
@@ -19,44 +195,105 @@ def get_extra_instructions() -> str:
     Returns:
         Extra instructions string (empty if none provided)
     """
-    print("\n" + "-"*60)
-    print("📝 OPTIONAL: Add extra instructions for repurposing")
-    print("-"*60)
-    print("Examples:")
-    print("  - 'Make it more casual and friendly'")
-    print("  - 'Focus on emphasizing the technical aspects'")
-    print("  - 'Use shorter sentences'")
-    print("  - 'Add more urgency to the CTA'")
-    print("-"*60)
+    sys.stdout.write("\n".join([
+        "",
+        "-"*60,
+        "📝 OPTIONAL: Add extra instructions for repurposing",
+        "-"*60,
+        "Examples:",
+        "  - 'Make it more casual and friendly'",
+        "  - 'Focus on emphasizing the technical aspects'",
+        "  - 'Use shorter sentences'",
+        "  - 'Add more urgency to the CTA'",
+        "-"*60,
+    ]) + "\n")
+    sys.stdout.flush()
     
     response = input("\nAdd extra instructions? (y/n): ").strip().lower()
     
     if response == 'y':
         print("\nEnter your instructions (press Enter twice when done):")
         print("-"*60)
-        lines = []
-        while True:
-            line = input()
-            if line == "" and len(lines) > 0:
-                break
-            if line:
-                lines.append(line)
+        sys.stdout.flush()
+        # Skip leading blank lines, then read until the first blank line (or EOF)
+        stdin_lines = iter(sys.stdin.readline, "")
+        lines = itertools.takewhile(lambda l: l.strip() != "", itertools.dropwhile(lambda l: l.strip() == "", stdin_lines))
         
-        instructions = "\n".join(lines).strip()
+        instructions = "".join(lines).strip()
         if instructions:
             print(f"\n✅ Instructions added: {instructions[:100]}{'...' if len(instructions) > 100 else ''}")
             return instructions
     
-        return ""
+    return ""
+
+def run_personalize(executor: ThreadPoolExecutor, input_file: str = "script.txt", db=None, use_cache: bool = True):
+    """
+    Personalize a script, structuring it in the background while the user
+    types optional extra instructions.
+    
+    Args:
+        executor: Executor used for the background structuring call
+        input_file: Path to the script to personalize
+        db: Personality database to reuse (loaded if not given)
+        use_cache: Reuse cached LLM outputs (False to force a fresh variant)
+    """
+    sections_future = executor.submit(prefetch_structure, input_file)
+    extra_instructions = get_extra_instructions()
+    repurpose_script(input_file=input_file, extra_instructions=extra_instructions, sections=sections_future.result(), db=db, use_cache=use_cache)
+
+def run_variants(count: int, input_file: str = "script.txt", db=None):
+    """
+    Generate several personalized variants of a script concurrently.
+    The script is structured once and the sections are shared by every variant;
+    variant i is saved to output_v{i}.txt.
+    
+    Args:
+        count: Number of variants to generate
+        input_file: Path to the script to personalize
+        db: Personality database to reuse (loaded if not given)
+    """
+    extra_instructions = get_extra_instructions()
+    sections = prefetch_structure(input_file)
+    if db is None:
+        db = load_db()
+    
+    async def run_all():
+        # Variants run quietly so their logs don't interleave; each is printed once done
+        return await asyncio.gather(*[
+            asyncio.to_thread(
+                repurpose_script,
+                input_file=input_file,
+                output_file=f"output_v{i}.txt",
+                extra_instructions=extra_instructions,
+                sections=sections,
+                db=db,
+                use_cache=False,
+                verbose=False,
+            )
+            for i in range(1, count + 1)
+        ])
+    
+    print(f"\n⏳ Generating {count} variant(s)...")
+    outputs = asyncio.run(run_all())
+    if outputs[0] is None:
+        # Empty script (already reported)
+        return
+    
+    for i, output in enumerate(outputs, 1):
+        print(f"\n{'='*60}")
+        print(f"VARIANT {i} (saved to output_v{i}.txt)")
+        print(f"{'='*60}\n")
+        print(output)
+    print(f"\n{'='*60}")
 
 # === MAIN ===
 
 if __name__ == "__main__":
-    # Ensure personality database exists
-    if not os.path.exists(DB_PATH):
-        build_personality_db()
-    else:
-        print(f"Personality DB found at {DB_PATH}/")
+    # Background worker for overlapping LLM calls with user input
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    # Raw scripts are written by options 1-2 and read by options 3-4
+    os.makedirs(RAW_SCRIPTS_DIR, exist_ok=True)
 
     # Display menu
     print("\n" + "="*60)
@@ -69,270 +306,166 @@ if __name__ == "__main__":
     print("4. Analyze raw script structure (no repurposing, saves to analyzed_scripts/)")
     print("5. Repurpose analyzed script (select from analyzed_scripts/ folder)")
     
+    # video_processor pulls in OpenCV and PySceneDetect; warm it up while the user reads the menu
+    threading.Thread(target=importlib.import_module, args=("video_processor",), daemon=True).start()
+    
     choice = input("\nEnter choice (1-5): ").strip()
     
+    # Ensure personality database exists (only needed by the options that personalize)
+    if choice in ["1", "2", "3", "5"]:
+        if not os.path.exists(DB_PATH):
+            build_personality_db()
+        else:
+            print(f"Personality DB found at {DB_PATH}/")
+    
     if choice == "1":
         # === Option 1: Full Video Processing (with scenes & screenshots) ===
-        videos_folder = "videos"
+        from video_processor import process_video, scenes_to_script
         
-        # Check for videos folder and list available videos
-        if os.path.exists(videos_folder):
-            video_extensions = ['*.mp4', '*.mov', '*.avi', '*.mkv', '*.webm']
-            video_files = []
-            for ext in video_extensions:
-                pattern = os.path.join(videos_folder, ext)
-                video_files.extend(glob.glob(pattern))
-            
-            if video_files:
-                print(f"\n📹 Found {len(video_files)} video(s) in videos/ folder:")
-                print("-" * 60)
-                for i, video in enumerate(video_files, 1):
-                    filename = os.path.basename(video)
-                    print(f"{i}. {filename}")
-                
-                print("-" * 60)
-                selection = input(f"\nSelect video (1-{len(video_files)}) or enter custom path: ").strip()
-                
-                # Check if it's a number selection
-                if selection.isdigit() and 1 <= int(selection) <= len(video_files):
-                    video_path = video_files[int(selection) - 1]
-                else:
-                    # Custom path
-                    video_path = selection
-            else:
-                print(f"\n⚠️  No videos found in {videos_folder}/ folder")
-                video_path = input("Enter path to video file: ").strip()
-        else:
-            print(f"\n💡 Tip: Create a 'videos/' folder to see video list")
-            video_path = input("Enter path to video file: ").strip()
+        video_path = select_video()
         
         # Process the video if it exists
         if os.path.exists(video_path):
-            # Create raw_scripts folder if it doesn't exist
-            raw_scripts_dir = "raw_scripts"
-            os.makedirs(raw_scripts_dir, exist_ok=True)
+            # Open the personality DB in the background while the video is processed
+            db_future = executor.submit(load_db)
             
             # Process video
             scenes = process_video(video_path)
             
             # Generate a filename based on the video name
             video_name = os.path.splitext(os.path.basename(video_path))[0]
-            raw_script_path = os.path.join(raw_scripts_dir, f"{video_name}_raw.txt")
+            raw_script_path = os.path.join(RAW_SCRIPTS_DIR, f"{video_name}_raw.txt")
             
             # Save raw extracted script to raw_scripts folder
             scenes_to_script(scenes, raw_script_path)
             print(f"\n💾 Raw script saved to: {raw_script_path}")
             
-            # Also save to script.txt for processing
-            scenes_to_script(scenes, "script.txt")
+            # Copy to script.txt for processing (no need to format the scenes twice)
+            fast_copy(raw_script_path, "script.txt")
             
             print("\n" + "="*60)
             print("Video processed! Now personalizing script...")
             print("="*60)
             
-            # Get optional extra instructions
-            extra_instructions = get_extra_instructions()
-            
             # Personalize the generated script
-            repurpose_script(extra_instructions=extra_instructions)
+            run_personalize(executor, db=db_future.result())
         else:
             print(f"Error: Video file not found: {video_path}")
     
     elif choice == "2":
         # === Option 2: Quick Transcribe Only (No Scenes/Screenshots) ===
-        videos_folder = "videos"
+        from video_processor import transcribe_only
         
-        # Check for videos folder and list available videos
-        if os.path.exists(videos_folder):
-            video_extensions = ['*.mp4', '*.mov', '*.avi', '*.mkv', '*.webm']
-            video_files = []
-            for ext in video_extensions:
-                pattern = os.path.join(videos_folder, ext)
-                video_files.extend(glob.glob(pattern))
-            
-            if video_files:
-                print(f"\n📹 Found {len(video_files)} video(s) in videos/ folder:")
-                print("-" * 60)
-                for i, video in enumerate(video_files, 1):
-                    filename = os.path.basename(video)
-                    print(f"{i}. {filename}")
-                
-                print("-" * 60)
-                selection = input(f"\nSelect video (1-{len(video_files)}) or enter custom path: ").strip()
-                
-                # Check if it's a number selection
-                if selection.isdigit() and 1 <= int(selection) <= len(video_files):
-                    video_path = video_files[int(selection) - 1]
-                else:
-                    # Custom path
-                    video_path = selection
-            else:
-                print(f"\n⚠️  No videos found in {videos_folder}/ folder")
-                video_path = input("Enter path to video file: ").strip()
-        else:
-            print(f"\n💡 Tip: Create a 'videos/' folder to see video list")
-            video_path = input("Enter path to video file: ").strip()
+        video_path = select_video()
         
         # Process the video if it exists
         if os.path.exists(video_path):
-            # Create raw_scripts folder if it doesn't exist
-            raw_scripts_dir = "raw_scripts"
-            os.makedirs(raw_scripts_dir, exist_ok=True)
+            # Open the personality DB in the background while the video is transcribed
+            db_future = executor.submit(load_db)
             
             # Generate a filename based on the video name
             video_name = os.path.splitext(os.path.basename(video_path))[0]
-            raw_script_path = os.path.join(raw_scripts_dir, f"{video_name}_raw.txt")
+            raw_script_path = os.path.join(RAW_SCRIPTS_DIR, f"{video_name}_raw.txt")
             
             # Quick transcribe only (save to raw_scripts)
             transcript_text = transcribe_only(video_path, raw_script_path)
             print(f"\n💾 Raw transcript saved to: {raw_script_path}")
             
             # Copy to script.txt for processing
-            shutil.copy(raw_script_path, "script.txt")
+            fast_copy(raw_script_path, "script.txt")
             
             print("\n" + "="*60)
             print("Transcription complete! Now personalizing script...")
             print("="*60)
             
-            # Get optional extra instructions
-            extra_instructions = get_extra_instructions()
-            
             # Personalize the generated script
-            repurpose_script(extra_instructions=extra_instructions)
+            run_personalize(executor, db=db_future.result())
         else:
             print(f"Error: Video file not found: {video_path}")
     
     elif choice == "3":
         # === Option 3: Personalize Raw Script (Select from raw_scripts/) ===
-        raw_scripts_dir = "raw_scripts"
+        selected_script = select_raw_script("Select raw script")
         
-        if os.path.exists(raw_scripts_dir):
-            raw_scripts = glob.glob(os.path.join(raw_scripts_dir, "*.txt"))
+        if selected_script:
+            # Copy selected raw script to script.txt for processing
+            fast_copy(selected_script, "script.txt")
+            print(f"\n✅ Loaded: {os.path.basename(selected_script)}")
             
-            if raw_scripts:
-                print(f"\n📝 Found {len(raw_scripts)} raw script(s):")
-                print("-" * 60)
-                for i, script_path in enumerate(raw_scripts, 1):
-                    filename = os.path.basename(script_path)
-                    print(f"{i}. {filename}")
-                
-                print("-" * 60)
-                selection = input(f"\nSelect raw script (1-{len(raw_scripts)}): ").strip()
-                
-                if selection.isdigit() and 1 <= int(selection) <= len(raw_scripts):
-                    selected_script = raw_scripts[int(selection) - 1]
-                    
-                    # Copy selected raw script to script.txt for processing
-                    shutil.copy(selected_script, "script.txt")
-                    print(f"\n✅ Loaded: {os.path.basename(selected_script)}")
-                    
-                    print("\n" + "="*60)
-                    print("Now personalizing script...")
-                    print("="*60)
-                    
-                    # Get optional extra instructions
-                    extra_instructions = get_extra_instructions()
-                    
-                    # Personalize the script
-                    repurpose_script(extra_instructions=extra_instructions)
-                else:
-                    print("Invalid selection")
-            else:
-                print(f"\n⚠️  No raw scripts found in {raw_scripts_dir}/ folder")
-                print("💡 Tip: Process a video first (option 1 or 2) to create raw scripts")
-        else:
-            print(f"\n⚠️  {raw_scripts_dir}/ folder not found")
-            print("💡 Tip: Process a video first (option 1 or 2) to create the folder")
+            print("\n" + "="*60)
+            print("Now personalizing script...")
+            print("="*60)
+            
+            # Personalize the script
+            run_personalize(executor)
     
     elif choice == "4":
         # === Option 4: Analyze Raw Script Structure Only ===
-        raw_scripts_dir = "raw_scripts"
+        selected_script = select_raw_script("Select raw script to analyze")
         
-        if os.path.exists(raw_scripts_dir):
-            raw_scripts = glob.glob(os.path.join(raw_scripts_dir, "*.txt"))
+        if selected_script:
+            print(f"\n✅ Selected: {os.path.basename(selected_script)}")
+            print("\n" + "="*60)
+            print("Analyzing script structure...")
+            print("="*60)
             
-            if raw_scripts:
-                print(f"\n📝 Found {len(raw_scripts)} raw script(s):")
-                print("-" * 60)
-                for i, script_path in enumerate(raw_scripts, 1):
-                    filename = os.path.basename(script_path)
-                    print(f"{i}. {filename}")
-                
-                print("-" * 60)
-                selection = input(f"\nSelect raw script to analyze (1-{len(raw_scripts)}): ").strip()
-                
-                if selection.isdigit() and 1 <= int(selection) <= len(raw_scripts):
-                    selected_script = raw_scripts[int(selection) - 1]
-                    
-                    print(f"\n✅ Selected: {os.path.basename(selected_script)}")
-                    print("\n" + "="*60)
-                    print("Analyzing script structure...")
-                    print("="*60)
-                    
-                    # Analyze the script (no repurposing)
-                    analyze_script_only(selected_script)
-                else:
-                    print("Invalid selection")
-            else:
-                print(f"\n⚠️  No raw scripts found in {raw_scripts_dir}/ folder")
-                print("💡 Tip: Process a video first (option 1 or 2) to create raw scripts")
-        else:
-            print(f"\n⚠️  {raw_scripts_dir}/ folder not found")
-            print("💡 Tip: Process a video first (option 1 or 2) to create the folder")
+            # Analyze the script (no repurposing)
+            analyze_script_only(selected_script)
     
     elif choice == "5":
         # === Option 5: Repurpose Analyzed Script ===
-        analyzed_scripts_dir = "analyzed_scripts"
-        selected_analyzed_script = None
+        selected_analyzed_script = select_from_folder(
+            ANALYZED_SCRIPTS_DIR,
+            "*.json",
+            label="analyzed script",
+            prompt="Select analyzed script to repurpose",
+            tip="Analyze a script first (option 4)",
+        )
         
-        if os.path.exists(analyzed_scripts_dir):
-            # Get all JSON files (analyzed scripts)
-            analyzed_scripts = glob.glob(os.path.join(analyzed_scripts_dir, "*.json"))
+        if selected_analyzed_script:
+            print(f"\n✅ Selected: {os.path.basename(selected_analyzed_script)}")
             
-            if analyzed_scripts:
-                print(f"\n📝 Found {len(analyzed_scripts)} analyzed script(s):")
-                print("-" * 60)
-                for i, script_path in enumerate(analyzed_scripts, 1):
-                    filename = os.path.basename(script_path)
-                    print(f"{i}. {filename}")
+            # Open the personality DB once for all regenerations
+            db = load_db()
+            
+            # Repurpose loop for option 5 (regenerations skip the LLM cache)
+            regenerating = False
+            while True:
+                print("\n" + "="*60)
+                print("Repurposing analyzed script...")
+                print("="*60)
                 
-                print("-" * 60)
-                selection = input(f"\nSelect analyzed script to repurpose (1-{len(analyzed_scripts)}): ").strip()
+                # Get optional extra instructions
+                extra_instructions = get_extra_instructions()
                 
-                if selection.isdigit() and 1 <= int(selection) <= len(analyzed_scripts):
-                    selected_analyzed_script = analyzed_scripts[int(selection) - 1]
-                    
-                    print(f"\n✅ Selected: {os.path.basename(selected_analyzed_script)}")
-                    
-                    # Repurpose loop for option 5
-                    while True:
-                        print("\n" + "="*60)
-                        print("Repurposing analyzed script...")
-                        print("="*60)
-                        
-                        # Get optional extra instructions
-                        extra_instructions = get_extra_instructions()
-                        
-                        # Repurpose the analyzed script
-                        repurpose_from_analyzed(selected_analyzed_script, extra_instructions=extra_instructions)
-                        
-                        # Ask if user wants to regenerate
-                        if input("\nRegenerate? (y/n): ").strip().lower() != "y":
-                            break
-                else:
-                    print("Invalid selection")
-            else:
-                print(f"\n⚠️  No analyzed scripts found in {analyzed_scripts_dir}/ folder")
-                print("💡 Tip: Analyze a script first (option 4) to create analyzed scripts")
-        else:
-            print(f"\n⚠️  {analyzed_scripts_dir}/ folder not found")
-            print("💡 Tip: Analyze a script first (option 4) to create the folder")
+                # Repurpose the analyzed script
+                repurpose_from_analyzed(selected_analyzed_script, extra_instructions=extra_instructions, db=db, use_cache=not regenerating)
+                
+                # Ask if user wants to regenerate
+                if input("\nRegenerate? (y/n): ").strip().lower() != "y":
+                    break
+                regenerating = True
     
     else:
         print("Invalid choice. Please select 1, 2, 3, 4, or 5.")
 
     # Optional: quick regenerate loop (only for repurposing options 1-3)
     if choice in ["1", "2", "3"]:
-        while input("\nRegenerate? (y/n): ").strip().lower() == "y":
-            extra_instructions = get_extra_instructions()
-            repurpose_script(extra_instructions=extra_instructions)
+        db = None
+        while True:
+            answer = input("\nRegenerate? (y/n, or v for multiple variants): ").strip().lower()
+            if answer not in ("y", "v"):
+                break
+            
+            # Reuse one personality DB handle across regenerations
+            if db is None:
+                db = load_db()
+            
+            if answer == "y":
+                run_personalize(executor, db=db, use_cache=False)
+            else:
+                count = input("How many variants? ").strip()
+                if count.isdigit() and int(count) > 0:
+                    run_variants(int(count), db=db)
+                else:
+                    print("Invalid number of variants")
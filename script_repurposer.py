@@ -1,115 +1,501 @@
 import os
+import re
 import json
+import time
+import uuid
+import base64
+import struct
+import sqlite3
+import hashlib
+import textwrap
+import asyncio
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_text_splitters import CharacterTextSplitter
-from langchain_chroma import Chroma
 from langchain_core.prompts import PromptTemplate
 
 # === Load API Key ===
+# main.py imports this module first, so .env is parsed here, once. Variables
+# already set in the environment take precedence over .env.
 load_dotenv()
 
 DB_PATH = "chroma_db"
 
-embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
+# === Clients ===
+# langchain_openai / langchain_chroma are heavy to import, so they're loaded
+# on first use rather than when main.py starts.
+
+EMBED_MODEL = "text-embedding-3-small"
+# text-embedding-3 vectors can be truncated with little recall loss;
+# 512 dims is 3x less to store and compare than the full 1536
+EMBED_DIMENSIONS = 512
+CHAT_MODEL = "gpt-4o-mini"
+# The per-line analysis call classifies lines but also writes user-visible
+# drafts, so it defaults to CHAT_MODEL (set UGC_ANALYSIS_MODEL, e.g. to
+# gpt-4.1-nano, to trade quality for speed)
+ANALYSIS_MODEL = os.getenv("UGC_ANALYSIS_MODEL", CHAT_MODEL)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_embeddings():
+    """Create the embeddings client on first use."""
+    from langchain_openai import OpenAIEmbeddings
+    # Embedding batches go out concurrently; back off and retry on 429s
+    # instead of failing a large personality build
+    return OpenAIEmbeddings(model=EMBED_MODEL, dimensions=EMBED_DIMENSIONS, max_retries=6)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_llm():
+    """Create the chat model on first use."""
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=CHAT_MODEL, temperature=0.7)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_json_llm(temperature: float = 0.0, model: str = CHAT_MODEL):
+    """
+    Create the chat model for JSON-returning prompts (JSON mode) on first use.
+    Deterministic by default: structuring and classification are closed tasks,
+    and identical inputs then give identical (cacheable) outputs.
+    """
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        model_kwargs={"response_format": {"type": "json_object"}},
+    )
+
+# How rhetorical roles are assigned: "llm" (part of the analysis call) or
+# "embedding" (local nearest-prototype match; filler lines skip the LLM)
+ROLE_ROUTER = os.getenv("UGC_ROLE_ROUTER", "llm").strip().lower()
+
+# Max LLM calls in flight at once, across every script being rewritten
+MAX_CONCURRENCY = int(os.getenv("UGC_MAX_CONCURRENCY", "8"))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_event_loop():
+    """
+    Start a background event loop shared by all async LLM calls.
+    The async OpenAI client's connection pool is tied to one loop, so every
+    call (from any thread) runs on this loop instead of a fresh asyncio.run().
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+@functools.lru_cache(maxsize=None)
+def _llm_slots():
+    """
+    Semaphore bounding concurrent LLM calls on the shared loop.
+    Shared by every caller, so concurrent variants (or analysis fallback
+    calls overlapping grounding calls) can't multiply the limit.
+    """
+    return asyncio.Semaphore(MAX_CONCURRENCY)
+
+
+def _run_async(coro):
+    """Run a coroutine on the shared event loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_event_loop()).result()
+
+# === LLM Response Cache ===
+# Persistent cache of LLM outputs keyed by a hash of everything that went into
+# the prompt, so re-running the same script skips calls it already paid for.
+
+LLM_CACHE_PATH = ".llm_cache.db"
+LLM_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+
+_cache_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _get_cache_db():
+    """Open the cache database on first use."""
+    conn = sqlite3.connect(LLM_CACHE_PATH, check_same_thread=False)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+    )
+    return conn
+
+
+def _cache_key(kind: str, *parts: str) -> str:
+    """Build a cache key from the prompt inputs."""
+    return f"{kind}:" + hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def cache_get(key: str):
+    """Return a cached value, or None on a miss or expired entry."""
+    with _cache_lock:
+        row = _get_cache_db().execute(
+            "SELECT value, expires FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+    if row is None or row[1] < time.time():
+        return None
+    return json.loads(row[0])
+
+
+def cache_set(key: str, value):
+    """Store a JSON-serializable value in the cache."""
+    with _cache_lock:
+        conn = _get_cache_db()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), time.time() + LLM_CACHE_TTL),
+        )
+        conn.commit()
+
+
+@functools.lru_cache(maxsize=4)
+def _file_fingerprint(path: str, mtime: float) -> str:
+    """Hash a file's contents (cached per mtime)."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _personality_fingerprint() -> str:
+    """Fingerprint of personality.txt, so rewrites are invalidated when it changes."""
+    if not os.path.exists("personality.txt"):
+        return ""
+    return _file_fingerprint("personality.txt", os.path.getmtime("personality.txt"))
 
 # === Prompt Templates ===
+# Each prompt is a fixed system message (instructions) plus a human message
+# holding only the per-call inputs. The system message is an identical prefix
+# across calls, so OpenAI's prefix prompt cache can reuse it.
+
+STRUCTURE_SYSTEM = (
+    "You are analyzing a UGC (User Generated Content) script.\n\n"
+    "Your job is to break this script into structured sections following the UGC format:\n\n"
+    "1. 😰 RELATABLE PAIN HOOK (1 sentence)\n"
+    "   - What specific pain point or problem does this address?\n"
+    "   - Should grab attention and make viewer feel understood\n\n"
+    "2. 🏠 BACKSTORY (2-4 short sentences)\n"
+    "   - Personal story about the struggle\n"
+    "   - Could be about: school, work, relationships, health, career, etc.\n"
+    "   - Makes the creator relatable and authentic\n\n"
+    "3. 💥 BREAKING POINT (1-2 sentences)\n"
+    "   - The moment they decided to change\n"
+    "   - What triggered the transformation\n"
+    "   - The 'enough is enough' moment\n\n"
+    "4. 📦 TAKEAWAY (2-3 sentences)\n"
+    "   - The solution or lesson learned\n"
+    "   - What changed after using the product/method\n"
+    "   - The transformation or benefit\n\n"
+    "5. 🤝 SOFT CTA (optional, 1 sentence)\n"
+    "   - Gentle call to action\n"
+    "   - Not pushy or salesy\n\n"
+    "Analyze the script and identify each section. Return a JSON object with this structure:\n"
+    "{\n"
+    "  \"sections\": [\n"
+    "    {\n"
+    "      \"type\": \"hook\",\n"
+    "      \"description\": \"Brief description of what this section is about\",\n"
+    "      \"content\": \"The actual text from the script\"\n"
+    "    },\n"
+    "    {\n"
+    "      \"type\": \"backstory\",\n"
+    "      \"description\": \"e.g., 'Backstory about struggling in school'\",\n"
+    "      \"content\": \"The actual text from the script\"\n"
+    "    },\n"
+    "    // ... more sections\n"
+    "  ]\n"
+    "}\n\n"
+    "Valid section types: hook, backstory, breaking_point, takeaway, cta, transition\n"
+    "Return ONLY valid JSON, no other text."
+)
 
 STRUCTURE_PROMPT = PromptTemplate(
     input_variables=["script"],
     template=(
-        "You are analyzing a UGC (User Generated Content) script.\n\n"
-        "Your job is to break this script into structured sections following the UGC format:\n\n"
-        "1. 😰 RELATABLE PAIN HOOK (1 sentence)\n"
-        "   - What specific pain point or problem does this address?\n"
-        "   - Should grab attention and make viewer feel understood\n\n"
-        "2. 🏠 BACKSTORY (2-4 short sentences)\n"
-        "   - Personal story about the struggle\n"
-        "   - Could be about: school, work, relationships, health, career, etc.\n"
-        "   - Makes the creator relatable and authentic\n\n"
-        "3. 💥 BREAKING POINT (1-2 sentences)\n"
-        "   - The moment they decided to change\n"
-        "   - What triggered the transformation\n"
-        "   - The 'enough is enough' moment\n\n"
-        "4. 📦 TAKEAWAY (2-3 sentences)\n"
-        "   - The solution or lesson learned\n"
-        "   - What changed after using the product/method\n"
-        "   - The transformation or benefit\n\n"
-        "5. 🤝 SOFT CTA (optional, 1 sentence)\n"
-        "   - Gentle call to action\n"
-        "   - Not pushy or salesy\n\n"
         "Original Script:\n"
-        "{script}\n\n"
-        "Analyze the script and identify each section. Return a JSON object with this structure:\n"
-        "{{\n"
-        "  \"sections\": [\n"
-        "    {{\n"
-        "      \"type\": \"hook\",\n"
-        "      \"description\": \"Brief description of what this section is about\",\n"
-        "      \"content\": \"The actual text from the script\"\n"
-        "    }},\n"
-        "    {{\n"
-        "      \"type\": \"backstory\",\n"
-        "      \"description\": \"e.g., 'Backstory about struggling in school'\",\n"
-        "      \"content\": \"The actual text from the script\"\n"
-        "    }},\n"
-        "    // ... more sections\n"
-        "  ]\n"
-        "}}\n\n"
-        "Valid section types: hook, backstory, breaking_point, takeaway, cta, transition\n"
-        "Return ONLY valid JSON, no other text.\n"
+        "{script}\n"
     ),
 )
 
-CLASSIFY_PROMPT = PromptTemplate(
-    input_variables=["chunk"],
-    template=(
-        "You are analyzing a line from a reference script.\n"
-        "Line: \"{chunk}\"\n\n"
-        "Your job:\n"
-        "1. Identify the rhetorical_role as ONE of:\n"
-        "   [hook, founder_backstory, credibility, proof, lesson, CTA, filler]\n"
-        "2. Write retrieval_query: a short description of what information about ANTONY "
-        "should be retrieved from his personal memory DB to REPLACE this line TRUTHFULLY.\n"
-        "   - Focus on Antony's real backstory, projects, long-term obsessions, results, etc.\n"
-        "   - If the line is clearly about fitness, but the product is a social/media/creator app,\n"
-        "     then retrieval_query should point to Antony's authentic connection to social media,\n"
-        "     online communities, building products, etc. NOT fitness.\n"
-        "3. If the line is filler and doesn't need personalization, set rhetorical_role='filler'\n"
-        "   and retrieval_query='none'.\n\n"
-        "Return a JSON object ONLY, like:\n"
-        "{{\"rhetorical_role\": \"founder_backstory\", \"retrieval_query\": \"Antony's long-term obsession with online communities and why he's building his current app.\"}}\n"
-    ),
+REWRITE_SYSTEM = (
+    "You are Antony.\n"
+    "You are rewriting one line from a reference script so it is 100% about YOU, "
+    "your real story, and your current product.\n\n"
+    "Rules:\n"
+    "- Ground everything in the provided context. If the original mentions being a "
+    "\"fitness freak\" or something unrelated, replace it with YOUR real, relevant story.\n"
+    "- Never invent achievements or fake numbers.\n"
+    "- Keep the same PURPOSE (hook / backstory / credibility / proof / lesson / CTA), "
+    "but mapped to your real journey (e.g. social media, online communities, building apps).\n"
+    "- Use your tone: fast, direct, and don't use words like \"yo\", \"fr\", \"deadass\", etc. No fluff.\n"
+    "- 1–2 sentences max.\n"
+    "- Output ONLY the rewritten line. No explanations."
 )
 
 REWRITE_PROMPT = PromptTemplate(
     input_variables=["chunk", "context", "rhetorical_role", "extra_instructions"],
     template=(
-        "You are Antony.\n"
-        "You are rewriting one line from a reference script so it is 100% about YOU, "
-        "your real story, and your current product.\n\n"
+        "{extra_instructions}\n\n"
+        "Context (true facts about you, your backstory, your work):\n"
+        "{context}\n\n"
+        "Rhetorical role of this line: {rhetorical_role}\n"
+        "Original line (DO NOT COPY DETAILS FROM HERE, ONLY STRUCTURE & INTENT):\n"
+        "{chunk}\n"
+    ),
+)
+
+# Classify + first-draft rewrite in one call. The draft is returned as-is when
+# retrieval finds nothing, so those lines only cost a single LLM round-trip.
+_FUSED_INSTRUCTIONS = (
+    "1. Identify the rhetorical_role as ONE of:\n"
+    "   [hook, founder_backstory, credibility, proof, lesson, CTA, filler]\n"
+    "2. Write retrieval_query: a short description of what information about ANTONY "
+    "should be retrieved from his personal memory DB to REPLACE this line TRUTHFULLY.\n"
+    "   - Focus on Antony's real backstory, projects, long-term obsessions, results, etc.\n"
+    "   - If the line is clearly about fitness, but the product is a social/media/creator app,\n"
+    "     then retrieval_query should point to Antony's authentic connection to social media,\n"
+    "     online communities, building products, etc. NOT fitness.\n"
+    "3. If the line is filler and doesn't need personalization, set rhetorical_role='filler',\n"
+    "   retrieval_query='none' and rewrite_draft='' (filler lines are kept as-is).\n"
+    "4. Otherwise write rewrite_draft: the line rewritten so it is about YOU and your current product, "
+    "keeping the same structure & intent but none of the original details.\n"
+    "   - You have no personal facts yet, so stay vague but honest. Never invent achievements or fake numbers.\n"
+    "   - Use your tone: fast, direct, and don't use words like \"yo\", \"fr\", \"deadass\", etc. No fluff.\n"
+    "   - 1–2 sentences max.\n\n"
+)
+
+_FUSED_EXAMPLE = (
+    "{\"rhetorical_role\": \"founder_backstory\", \"retrieval_query\": \"Antony's long-term obsession with online communities and why he's building his current app.\", "
+    "\"rewrite_draft\": \"I've been obsessed with how people connect online for years.\"}"
+)
+
+FUSED_SYSTEM = (
+    "You are Antony, analyzing and rewriting one line from a reference script.\n\n"
+    "Your job:\n"
+    + _FUSED_INSTRUCTIONS +
+    "Return a JSON object ONLY, like:\n"
+    + _FUSED_EXAMPLE
+)
+
+FUSED_PROMPT = PromptTemplate(
+    input_variables=["chunk", "extra_instructions"],
+    template=(
+        "{extra_instructions}\n\n"
+        "Line: \"{chunk}\"\n"
+    ),
+)
+
+# Same as FUSED_SYSTEM for every line of a script at once (instructions sent once)
+FUSED_BATCH_SYSTEM = (
+    "You are Antony, analyzing and rewriting lines from a reference script.\n\n"
+    "For EACH line, independently:\n"
+    + _FUSED_INSTRUCTIONS +
+    "Return a JSON object ONLY, like {\"lines\": [...]}, whose \"lines\" array has one object per line, in the same order. "
+    "Each object looks like this, plus a \"line\" field with the line's number:\n"
+    + _FUSED_EXAMPLE
+)
+
+FUSED_BATCH_PROMPT = PromptTemplate(
+    input_variables=["lines", "count", "extra_instructions"],
+    template=(
+        "{extra_instructions}\n\n"
+        "Lines ({count} total, return exactly {count} objects):\n"
+        "{lines}\n"
+    ),
+)
+
+# Second pass used only when retrieval found personal context for the line
+GROUND_SYSTEM = (
+    "You are Antony.\n"
+    "Rewrite the draft line below so it is grounded in your real story.\n\n"
+    "Rules:\n"
+    "- Replace vague parts of the draft with specifics from the context.\n"
+    "- Never invent achievements or fake numbers.\n"
+    "- Keep the same tone and length (1–2 sentences max).\n"
+    "- Output ONLY the rewritten line. No explanations."
+)
+
+GROUND_PROMPT = PromptTemplate(
+    input_variables=["chunk", "draft", "context", "rhetorical_role", "extra_instructions"],
+    template=(
+        "{extra_instructions}\n\n"
         "Context (true facts about you, your backstory, your work):\n"
         "{context}\n\n"
         "Rhetorical role of this line: {rhetorical_role}\n"
         "Original line (DO NOT COPY DETAILS FROM HERE, ONLY STRUCTURE & INTENT):\n"
         "{chunk}\n\n"
-        "Rules:\n"
-        "- Ground everything in the provided context. If the original mentions being a "
-        "\"fitness freak\" or something unrelated, replace it with YOUR real, relevant story.\n"
-        "- Never invent achievements or fake numbers.\n"
-        "- Keep the same PURPOSE (hook / backstory / credibility / proof / lesson / CTA), "
-        "but mapped to your real journey (e.g. social media, online communities, building apps).\n"
-        "- Use your tone: fast, direct, and don't use words like \"yo\", \"fr\", \"deadass\", etc. No fluff.\n"
-        "- 1–2 sentences max.\n"
-        "- Output ONLY the rewritten line. No explanations.\n\n"
-        "{extra_instructions}"
+        "Draft:\n"
+        "{draft}\n"
     ),
 )
 
+
+def _messages(system: str, fmt, **inputs) -> list:
+    """Build the [system, human] message pair for one prompt."""
+    return [("system", system), ("human", fmt(**inputs))]
+
+
+# Bound str.format of each template, skipping PromptTemplate's per-call
+# input validation (the templates are fixed, so it can't fail at runtime)
+_structure_fmt = STRUCTURE_PROMPT.template.format
+_fused_fmt = FUSED_PROMPT.template.format
+_fused_batch_fmt = FUSED_BATCH_PROMPT.template.format
+_ground_fmt = GROUND_PROMPT.template.format
+_rewrite_fmt = REWRITE_PROMPT.template.format
+
 # === Database Functions ===
 
+EMBED_BATCH_SIZE = 128
+# Chroma rejects adds over its max batch size; keep each insert small
+CHROMA_ADD_BATCH_SIZE = 100
+
+
+def embed_texts(texts: list, batch_size: int = EMBED_BATCH_SIZE) -> list:
+    """
+    Embed texts with one request per batch, sending the batches concurrently.
+    
+    Args:
+        texts: Texts to embed
+        batch_size: Max texts per embeddings request
+        
+    Returns:
+        List of embedding vectors, in the same order as texts
+    """
+    if not texts:
+        return []
+
+    embeddings = _get_embeddings()
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if len(batches) == 1:
+        return embeddings.embed_documents(batches[0])
+
+    with ThreadPoolExecutor(max_workers=min(len(batches), 8)) as executor:
+        results = executor.map(embeddings.embed_documents, batches)
+    return [vector for batch in results for vector in batch]
+
+
+def embed_queries(texts: list) -> list:
+    """
+    Embed retrieval queries / script lines through the persistent LLM cache,
+    so each distinct text is only sent to the embeddings API once.
+    
+    Args:
+        texts: Texts to embed
+        
+    Returns:
+        List of embedding vectors, in the same order as texts
+    """
+    keys = [_cache_key("embed", EMBED_MODEL, str(EMBED_DIMENSIONS), t) for t in texts]
+    vectors = [cache_get(key) for key in keys]
+
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        for i, vector in zip(missing, embed_texts([texts[i] for i in missing])):
+            vectors[i] = vector
+            cache_set(keys[i], vector)
+    return vectors
+
+
+# Embeddings of personality.txt windows from earlier builds (sha256 -> vector),
+# so rebuilding after a small edit only embeds the windows that changed
+PERSONALITY_EMBED_CACHE_PATH = ".personality_embed_cache.json"
+
+
+def _pack_vector(vector: list) -> str:
+    """Pack a vector as base64 float32 (~1/4 the size of JSON floats)."""
+    return base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+
+
+def _unpack_vector(packed: str) -> list:
+    """Inverse of _pack_vector."""
+    raw = base64.b64decode(packed)
+    return list(struct.unpack(f"<{len(raw) // 4}f", raw))
+
+
+def embed_texts_cached(texts: list, cache_path: str = PERSONALITY_EMBED_CACHE_PATH) -> list:
+    """
+    Embed texts, reusing vectors stored in a JSON cache on disk.
+    Only texts not in the cache are sent to the API; the cache is rewritten
+    to hold exactly the current texts. Vectors are stored as float32, the
+    precision Chroma keeps them in, so nothing is lost on insert.
+    
+    Args:
+        texts: Texts to embed
+        cache_path: JSON file mapping sha256(model + dimensions + text) to its packed vector
+        
+    Returns:
+        List of embedding vectors, in the same order as texts
+    """
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        cache = {}
+
+    # "float32" keeps entries packed by older (float16) versions from being misread
+    keys = [hashlib.sha256(f"{EMBED_MODEL}\x1f{EMBED_DIMENSIONS}\x1ffloat32\x1f{t}".encode("utf-8")).hexdigest() for t in texts]
+    missing = [i for i, key in enumerate(keys) if not isinstance(cache.get(key), str)]
+    if missing:
+        print(f"Embedding {len(missing)} new chunk(s), {len(texts) - len(missing)} cached")
+        for i, vector in zip(missing, embed_texts([texts[i] for i in missing])):
+            cache[keys[i]] = _pack_vector(vector)
+
+    if missing or len(cache) != len(set(keys)):
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({key: cache[key] for key in keys}, f)
+    return [_unpack_vector(cache[key]) for key in keys]
+
+
+_SPACE_RE = re.compile(r'\s+')
+
+
+def split_text_windows(text: str, size: int = 400, overlap: int = 60) -> list:
+    """
+    Split text into overlapping windows of up to `size` characters.
+    Window edges are snapped to whitespace so no window starts or ends
+    mid-word (unless a single word is longer than the window allows).
+    
+    Args:
+        text: Text to split
+        size: Max window size in characters
+        overlap: Approximate characters shared between consecutive windows
+        
+    Returns:
+        List of text windows
+    """
+    windows = []
+    start = 0
+    while start + size < len(text):
+        end = start + size
+        # End at the last whitespace inside the window
+        cut = max(text.rfind(" ", start, end + 1), text.rfind("\n", start, end + 1))
+        if cut > start + overlap:
+            end = cut
+        windows.append(text[start:end])
+
+        # Step back by `overlap`, then forward to the start of the next word
+        start = end - overlap
+        space = _SPACE_RE.search(text, start, end)
+        if space:
+            start = space.end()
+    windows.append(text[start:])
+    return windows
+
+
+# Index and embedding settings the personality DB is built with; load_db
+# rebuilds it when they change
+PERSONALITY_DB_METADATA = {
+    "hnsw:space": "cosine",
+    # The corpus is small (dozens to hundreds of windows): a denser graph
+    # built once keeps recall high with a small per-query search beam
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 8,
+    "embed_model": EMBED_MODEL,
+    "embed_dimensions": EMBED_DIMENSIONS,
+    "embed_precision": "float32",
+}
+
+
 def build_personality_db():
     """
     Build a Chroma DB from personality.txt.
@@ -127,52 +513,236 @@ def build_personality_db():
     if not text.strip():
         raise ValueError("personality.txt is empty.")
 
-    splitter = CharacterTextSplitter(chunk_size=400, chunk_overlap=60)
-    chunks = [c.strip() for c in splitter.split_text(text) if c.strip()]
+    from langchain_chroma import Chroma
+
+    chunks = [c.strip() for c in split_text_windows(text, size=400, overlap=60) if c.strip()]
+
+    # Embed everything up front in a few batched requests (skipping windows
+    # embedded by an earlier build), then store the precomputed vectors directly
+    vectors = embed_texts_cached(chunks)
 
-    db = Chroma.from_texts(
-        texts=chunks,
-        embedding=embeddings,
+    # Start from an empty collection (a rebuild may change the vector size)
+    Chroma(persist_directory=DB_PATH, embedding_function=_get_embeddings()).delete_collection()
+    db = Chroma(
         persist_directory=DB_PATH,
+        embedding_function=_get_embeddings(),
+        collection_metadata=PERSONALITY_DB_METADATA,
     )
+    for i in range(0, len(chunks), CHROMA_ADD_BATCH_SIZE):
+        batch = slice(i, i + CHROMA_ADD_BATCH_SIZE)
+        db._collection.add(
+            ids=[str(uuid.uuid4()) for _ in chunks[batch]],
+            embeddings=vectors[batch],
+            documents=chunks[batch],
+        )
     print(f"Personality DB saved to {DB_PATH}/")
 
+    # Drop any cached handle so the next load_db() sees the rebuilt DB
+    global _DB
+    _DB = None
+
+
+# Personality DB kept resident across repurpose runs, with the DB_PATH mtime
+# it was opened at
+_DB = None
+_DB_MTIME = None
+
 
 def load_db():
-    """Load or build the personality database."""
-    if not os.path.exists(DB_PATH):
+    """
+    Load or build the personality database.
+    The Chroma client (and its index) stays open for the whole process and is
+    only reopened if DB_PATH changes on disk. A DB built with other embedding
+    settings (see PERSONALITY_DB_METADATA) is rebuilt.
+    """
+    global _DB, _DB_MTIME
+
+    try:
+        mtime = os.path.getmtime(DB_PATH)
+    except FileNotFoundError:
         build_personality_db()
-    return Chroma(persist_directory=DB_PATH, embedding_function=embeddings)
+        mtime = None
+
+    if _DB is None or mtime != _DB_MTIME:
+        from langchain_chroma import Chroma
+        _DB = Chroma(persist_directory=DB_PATH, embedding_function=_get_embeddings())
+        metadata = _DB._collection.metadata or {}
+        if any(metadata.get(k) != v for k, v in PERSONALITY_DB_METADATA.items()):
+            print("Embedding settings changed, rebuilding personality DB...")
+            build_personality_db()
+            _DB = Chroma(persist_directory=DB_PATH, embedding_function=_get_embeddings())
+        # Stat after opening: Chroma may create files in DB_PATH on open,
+        # which must not look like an outside change on the next call
+        _DB_MTIME = os.path.getmtime(DB_PATH)
+    return _DB
+
+
+# === Semantic Rewrite Cache ===
+# Paraphrased lines ("the one thing I learned..." / "here's what I learned...")
+# personalize the same way, so rewrites are also cached by chunk embedding.
+# Entries expire after LLM_CACHE_TTL, like the exact-match cache.
+
+SEMANTIC_CACHE_PATH = ".rewrite_cache"
+SEMANTIC_CACHE_THRESHOLD = 0.92  # min cosine similarity for a hit
+
+
+@functools.lru_cache(maxsize=None)
+def _get_rewrite_cache_db():
+    """Open the semantic rewrite cache collection on first use."""
+    from langchain_chroma import Chroma
+    return Chroma(
+        # Vectors of another size can't be queried, so each size gets its own collection
+        collection_name=f"rewrite_cache_{EMBED_DIMENSIONS}",
+        persist_directory=SEMANTIC_CACHE_PATH,
+        embedding_function=_get_embeddings(),
+        collection_metadata={"hnsw:space": "cosine"},
+    )
+
+
+def semantic_cache_lookup(vectors: list, variant: str) -> list:
+    """
+    Find cached rewrites for similar chunks.
+    
+    Args:
+        vectors: Chunk embeddings to look up
+        variant: Key of everything besides the chunk that shapes the rewrite
+        
+    Returns:
+        One cached rewrite (or None) per vector
+    """
+    collection = _get_rewrite_cache_db()._collection
+    if not vectors or collection.count() == 0:
+        return [None] * len(vectors)
+
+    results = collection.query(
+        query_embeddings=vectors,
+        n_results=1,
+        where={"$and": [{"variant": variant}, {"expires": {"$gt": time.time()}}]},
+        include=["metadatas", "distances"],
+    )
+    hits = []
+    for metadatas, distances in zip(results["metadatas"], results["distances"]):
+        # Cosine distance = 1 - similarity
+        if metadatas and 1 - distances[0] >= SEMANTIC_CACHE_THRESHOLD:
+            hits.append(metadatas[0]["out"])
+        else:
+            hits.append(None)
+    return hits
+
+
+def semantic_cache_store(chunks: list, vectors: list, outputs: list, variant: str):
+    """
+    Add rewritten chunks (with their embeddings) to the semantic cache,
+    replacing earlier entries for the same chunk, and drop expired entries.
+    Lines kept unchanged are left out: a near-identical line isn't
+    necessarily filler too.
+    """
+    entries = [(chunk, vector, out) for chunk, vector, out in zip(chunks, vectors, outputs) if out != chunk]
+    if not entries:
+        return
+    chunks, vectors, outputs = zip(*entries)
+    now = time.time()
+    collection = _get_rewrite_cache_db()._collection
+    collection.upsert(
+        ids=[_cache_key(variant, chunk) for chunk in chunks],
+        embeddings=list(vectors),
+        documents=list(chunks),
+        metadatas=[{"variant": variant, "out": out, "expires": now + LLM_CACHE_TTL} for out in outputs],
+    )
+    collection.delete(where={"expires": {"$lt": now}})
+
+
+# === Role Router ===
+# Roles are semantically stable, so with UGC_ROLE_ROUTER=embedding a chunk's
+# role is the label whose prototype embedding is closest to the chunk's.
+
+ROLE_PROTOTYPES = {
+    "hook": "A hook line designed to stop the scroll: a bold claim, question, or relatable pain that grabs attention.",
+    "founder_backstory": "A personal backstory line about the creator's past struggles, journey, or why they started building.",
+    "credibility": "A line establishing authority: experience, credentials, or what the creator has built or achieved.",
+    "proof": "A line giving proof or results: numbers, outcomes, testimonials, or before-and-after evidence.",
+    "lesson": "A line sharing the lesson, insight, or takeaway the creator learned.",
+    "CTA": "A call to action asking the viewer to follow, comment, download, sign up, or check the link.",
+    "filler": "A filler connector line with no real content, like 'so yeah', 'anyway', 'here's the thing', or a one-word hype.",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _get_role_prototypes():
+    """Embed the role prototypes once per process."""
+    labels = list(ROLE_PROTOTYPES)
+    return labels, embed_texts([ROLE_PROTOTYPES[label] for label in labels])
+
+
+def route_roles(vectors: list) -> list:
+    """
+    Assign each chunk embedding the role of its most similar prototype.
+    OpenAI embeddings are unit-length, so the dot product is the cosine similarity.
+    
+    Args:
+        vectors: Chunk embeddings
+        
+    Returns:
+        One rhetorical role per vector
+    """
+    if not vectors:
+        return []
+    labels, prototypes = _get_role_prototypes()
+    roles = []
+    for vector in vectors:
+        scores = [sum(a * b for a, b in zip(vector, prototype)) for prototype in prototypes]
+        roles.append(labels[scores.index(max(scores))])
+    return roles
 
 
 # === Script Processing Functions ===
 
-def structure_script(script: str) -> list:
+_FENCE_RE = re.compile(r'^\s*```[\w-]*\s*|\s*```\s*$')
+
+
+def _strip_code_fence(text: str) -> str:
+    """Remove a markdown code block wrapper (```json, ```JSON, ...) from LLM output, if present."""
+    return _FENCE_RE.sub("", text)
+
+
+def print_sections(sections: list):
+    """Print a short summary of structured script sections."""
+    print(f"✅ Identified {len(sections)} section(s):\n")
+    for i, section in enumerate(sections, 1):
+        section_type = section.get("type", "unknown")
+        description = section.get("description", "")
+        content_preview = section.get("content", "")[:60]
+        print(f"   {i}. [{section_type.upper()}] {description}")
+        print(f"      Preview: {content_preview}...")
+
+
+def structure_script(script: str, verbose: bool = True, use_cache: bool = True) -> list:
     """
     Use AI to analyze and break down the script into structured sections.
     
     Args:
         script: Raw script text
+        verbose: Print progress and the identified sections
+        use_cache: Reuse the cached structure of an identical script
         
     Returns:
         List of section dictionaries with type, description, and content
     """
-    print("\n🔍 Analyzing script structure...")
+    if verbose:
+        print("\n🔍 Analyzing script structure...")
+    
+    key = _cache_key("structure", CHAT_MODEL, STRUCTURE_SYSTEM, STRUCTURE_PROMPT.template, script)
+    sections = cache_get(key) if use_cache else None
+    if sections:
+        if verbose:
+            print_sections(sections)
+        return sections
     
     try:
-        resp = llm.invoke(STRUCTURE_PROMPT.format(script=script))
+        resp = _get_json_llm().invoke(_messages(STRUCTURE_SYSTEM, _structure_fmt, script=script))
         text = resp.content.strip()
         
-        # Remove markdown code blocks if present
-        if text.startswith("```json"):
-            text = text[7:]
-        if text.startswith("```"):
-            text = text[3:]
-        if text.endswith("```"):
-            text = text[:-3]
-        text = text.strip()
-        
-        data = json.loads(text)
+        data = json.loads(_strip_code_fence(text))
         sections = data.get("sections", [])
         
         if not sections:
@@ -183,13 +753,9 @@ def structure_script(script: str) -> list:
                 "content": script
             }]
         
-        print(f"✅ Identified {len(sections)} section(s):\n")
-        for i, section in enumerate(sections, 1):
-            section_type = section.get("type", "unknown")
-            description = section.get("description", "")
-            content_preview = section.get("content", "")[:60]
-            print(f"   {i}. [{section_type.upper()}] {description}")
-            print(f"      Preview: {content_preview}...")
+        cache_set(key, sections)
+        if verbose:
+            print_sections(sections)
         
         return sections
         
@@ -211,26 +777,35 @@ def structure_script(script: str) -> list:
         }]
 
 
-def analyze_chunk(chunk: str) -> dict:
-    """
-    Use the LLM to understand what this line is doing
-    and what we should retrieve from the memory DB.
-    """
-    resp = llm.invoke(CLASSIFY_PROMPT.format(chunk=chunk))
-    text = resp.content.strip()
-
+def _parse_analysis(text: str) -> dict:
+    """Parse and normalize the classifier's JSON output."""
     # Be defensive about malformed JSON
     try:
-        data = json.loads(text)
+        data = json.loads(text.strip())
     except json.JSONDecodeError:
-        # Fallback: treat as filler with no retrieval
-        data = {
-            "rhetorical_role": "filler",
-            "retrieval_query": "none"
-        }
+        data = None
+
+    analysis = _normalize_analysis(data) if isinstance(data, dict) else None
+    if analysis is None:
+        # Fallback: no draft, so the line gets a full rewrite (not kept as filler)
+        analysis = _normalize_analysis({})
+    return analysis
 
-    role = data.get("rhetorical_role", "filler")
+
+def _normalize_analysis(data: dict) -> dict:
+    """
+    Normalize one analysis object (role, retrieval query, draft).
+    Only an explicit "filler" role keeps the original line; a missing role
+    becomes "unknown" so the line is still rewritten.
+    
+    Returns:
+        The normalized analysis, or None if a field isn't a string
+    """
+    role = data.get("rhetorical_role") or "unknown"
     query = data.get("retrieval_query", "none")
+    draft = data.get("rewrite_draft", "")
+    if not all(isinstance(field, str) or field is None for field in (role, query, draft)):
+        return None
 
     # Normalize
     role = role.strip().lower()
@@ -239,155 +814,636 @@ def analyze_chunk(chunk: str) -> dict:
 
     return {
         "rhetorical_role": role,
-        "retrieval_query": query
+        "retrieval_query": query,
+        "rewrite_draft": (draft or "").strip()
     }
 
 
+def _join_context(texts: list, top_k: int = 4) -> str:
+    """Join distinct retrieved chunks; keep it compact."""
+    unique = dict.fromkeys(t for t in (text.strip() for text in texts) if t)
+    return " | ".join(list(unique)[:top_k])
+
+
+def retrieve_contexts(db, retrieval_queries: list, top_k: int = 4, ctx_cache: dict = None) -> list:
+    """
+    Retrieve context for many queries with one embedding request and one
+    Chroma query. Queries that are 'none' get empty context.
+    
+    Args:
+        db: Personality database
+        retrieval_queries: One retrieval query per chunk
+        top_k: Max chunks of context per query
+        ctx_cache: Optional per-run dict of (case-folded) query -> context;
+            repeated queries are served from it instead of Chroma
+        
+    Returns:
+        One context string per query, in order
+    """
+    if ctx_cache is None:
+        ctx_cache = {}
+
+    # Only look up each distinct, not-yet-seen query once
+    wanted = {}
+    for q in retrieval_queries:
+        key = q.casefold()
+        if q != "none" and key not in ctx_cache:
+            wanted.setdefault(key, q)
+
+    if wanted:
+        vectors = embed_queries(list(wanted.values()))
+
+        # One Chroma query for every vector instead of one search per chunk
+        results = db._collection.query(
+            query_embeddings=vectors,
+            n_results=top_k,
+            include=["documents"],
+        )
+        for key, documents in zip(wanted, results["documents"]):
+            ctx_cache[key] = _join_context(documents, top_k)
+
+    return ["" if q == "none" else ctx_cache[q.casefold()] for q in retrieval_queries]
+
+
 def retrieve_context(db, retrieval_query: str, top_k: int = 4) -> str:
     """
     Use a purpose-built retrieval query instead of the raw line.
     If retrieval_query is 'none', return empty context.
     """
-    if retrieval_query == "none":
-        return ""
+    return retrieve_contexts(db, [retrieval_query], top_k)[0]
 
-    docs = db.similarity_search(retrieval_query, k=top_k)
-    if not docs:
+
+def _format_extra_instructions(extra_instructions: str) -> str:
+    """Format extra instructions for inclusion in a prompt."""
+    if not extra_instructions:
         return ""
+    return f"Additional Instructions:\n{extra_instructions}"
+
+
+async def astream_analyses(chunks: list, extra_instructions: str = "", use_cache: bool = True):
+    """
+    Classify and draft every chunk with ONE streamed LLM call, yielding
+    analyses as soon as they're available so later stages can start on the
+    first lines while the rest are still being generated.
+    Falls back to one fused call per chunk for anything the batched output
+    didn't cover (unparseable or missing lines).
+    
+    Args:
+        chunks: Text chunks to analyze
+        extra_instructions: Optional extra instructions for the drafts (already stripped)
+        use_cache: Reuse cached analyses (results are cached either way)
+        
+    Yields:
+        Lists of (chunk index, analysis dict) pairs that became ready together
+    """
+    keys = [
+        _cache_key("analysis", ANALYSIS_MODEL, FUSED_SYSTEM, FUSED_PROMPT.template, extra_instructions, chunk)
+        for chunk in chunks
+    ]
+    hits = []
+    misses = []
+    for i, key in enumerate(keys):
+        analysis = cache_get(key) if use_cache else None
+        if analysis is None:
+            misses.append(i)
+        else:
+            hits.append((i, analysis))
+    if hits:
+        yield hits
+
+    if misses:
+        # Regenerations want fresh drafts, so only they sample
+        temperature = 0.0 if use_cache else 0.7
+        async for ready in _astream_analyses_uncached([chunks[i] for i in misses], extra_instructions, temperature):
+            for j, analysis in ready:
+                cache_set(keys[misses[j]], analysis)
+            yield [(misses[j], analysis) for j, analysis in ready]
 
-    # Join distinct chunks; keep it compact
-    unique = []
-    for d in docs:
-        t = d.page_content.strip()
-        if t and t not in unique:
-            unique.append(t)
 
-    return " | ".join(unique[:top_k])
+async def aanalyze_chunks(chunks: list, extra_instructions: str = "", use_cache: bool = True) -> list:
+    """
+    Classify and draft every chunk (see astream_analyses).
+    
+    Returns:
+        One analysis dict per chunk, in order
+    """
+    analyses = [None] * len(chunks)
+    async for ready in astream_analyses(chunks, extra_instructions, use_cache):
+        for i, analysis in ready:
+            analyses[i] = analysis
+    return analyses
+
+
+def _pop_json_objects(buffer: str, pos: int):
+    """
+    Decode the complete JSON objects in a partial JSON array.
+    
+    Returns:
+        (decoded objects, position to resume from once more text arrives)
+    """
+    decoder = json.JSONDecoder()
+    objects = []
+    while True:
+        start = buffer.find("{", pos)
+        if start == -1:
+            return objects, pos
+        try:
+            obj, end = decoder.raw_decode(buffer, start)
+        except json.JSONDecodeError:
+            # Incomplete so far
+            return objects, start
+        objects.append(obj)
+        pos = end
+
+
+async def _astream_analyses_uncached(chunks: list, extra_instructions: str = "", temperature: float = 0.0):
+    """Streamed batched (with per-chunk fallback) analysis LLM call, see astream_analyses."""
+    extra_instructions_text = _format_extra_instructions(extra_instructions)
+    remaining = set(range(len(chunks)))
+
+    if len(chunks) > 1:
+        lines = "\n".join(f"{i}. {json.dumps(chunk, ensure_ascii=False)}" for i, chunk in enumerate(chunks, 1))
+        prompt = _messages(
+            FUSED_BATCH_SYSTEM, _fused_batch_fmt,
+            lines=lines, count=len(chunks), extra_instructions=extra_instructions_text,
+        )
+
+        buffer = ""
+        pos = 0
+        seen = 0
+        # The stream is one (long) LLM call, so it holds a slot like any other
+        async with _llm_slots():
+            async for piece in _get_json_llm(temperature, ANALYSIS_MODEL).astream(prompt):
+                buffer += piece.content
+                if not pos:
+                    # Per-line objects start inside the {"lines": [...]} wrapper
+                    bracket = buffer.find("[")
+                    if bracket == -1:
+                        continue
+                    pos = bracket + 1
+                objects, pos = _pop_json_objects(buffer, pos)
+                ready = []
+                for data in objects:
+                    # Objects carry their line number, so a skipped line can't shift the rest
+                    line = data.get("line") if isinstance(data, dict) else None
+                    i = line - 1 if isinstance(line, int) else seen
+                    seen += 1
+                    # Invalid objects stay in `remaining` for the per-chunk fallback
+                    analysis = _normalize_analysis(data) if isinstance(data, dict) else None
+                    if analysis is not None and i in remaining:
+                        remaining.discard(i)
+                        ready.append((i, analysis))
+                if ready:
+                    yield ready
+
+        if not remaining:
+            return
+        print(f"⚠️  Batched analysis missed {len(remaining)} chunk(s), analyzing them one by one")
+
+    async def analyze_one(i: int):
+        async with _llm_slots():
+            resp = await _get_json_llm(temperature, ANALYSIS_MODEL).ainvoke(
+                _messages(FUSED_SYSTEM, _fused_fmt, chunk=chunks[i], extra_instructions=extra_instructions_text)
+            )
+            return i, _parse_analysis(resp.content)
+
+    # Explicit tasks, so they can be cancelled if the consumer stops early or fails
+    tasks = [asyncio.create_task(analyze_one(i)) for i in sorted(remaining)]
+    try:
+        for result in asyncio.as_completed(tasks):
+            yield [await result]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _afinish_chunk(chunk: str, analysis: dict, context: str, extra_instructions: str = "", use_cache: bool = True) -> str:
+    """
+    Produce the final line for an analyzed chunk and its retrieved context.
+    Filler lines are kept unchanged. If context was found the draft is
+    grounded in it (one LLM call); otherwise the draft is the final line.
+    """
+    role = analysis["rhetorical_role"]
+    draft = analysis["rewrite_draft"]
+
+    # Filler needs no personalization; keep the original line
+    if role == "filler":
+        return chunk
+
+    if context or not draft:
+        key = _cache_key(
+            "rewrite", CHAT_MODEL, GROUND_SYSTEM, GROUND_PROMPT.template, REWRITE_SYSTEM, REWRITE_PROMPT.template,
+            _personality_fingerprint(),
+            chunk, context, role, draft, extra_instructions,
+        )
+        adapted = cache_get(key) if use_cache else None
+        if adapted is None:
+            adapted = await _arewrite_uncached(chunk, role, draft, context, extra_instructions)
+            cache_set(key, adapted)
+        return adapted
+
+    # Nothing to ground in; the draft already avoids fake specifics
+    return draft
+
+
+async def _arewrite_uncached(chunk: str, role: str, draft: str, context: str, extra_instructions: str = "") -> str:
+    """Grounding (or fallback full rewrite) LLM call, see _afinish_chunk."""
+    extra_instructions_text = _format_extra_instructions(extra_instructions)
+
+    if context and draft:
+        resp = await _get_llm().ainvoke(
+            _messages(
+                GROUND_SYSTEM, _ground_fmt,
+                chunk=chunk,
+                draft=draft,
+                context=context,
+                rhetorical_role=role,
+                extra_instructions=extra_instructions_text,
+            )
+        )
+    else:
+        # Malformed analysis; fall back to a single full rewrite
+        resp = await _get_llm().ainvoke(
+            _messages(
+                REWRITE_SYSTEM, _rewrite_fmt,
+                chunk=chunk,
+                context=context if context else "(no specific facts; stay vague but honest)",
+                rhetorical_role=role,
+                extra_instructions=extra_instructions_text,
+            )
+        )
+
+    return resp.content.strip()
 
 
-def rewrite_chunk(chunk: str, db, extra_instructions: str = "") -> str:
+async def arewrite_chunk(chunk: str, db, extra_instructions: str = "", use_cache: bool = True) -> str:
     """
     Full pipeline for a single chunk:
-    1. Classify its role & desired retrieval target.
+    1. Classify its role & retrieval target and draft a rewrite (one LLM call).
     2. Retrieve relevant personal context.
-    3. Rewrite grounded in that context.
+    3. Ground the draft in that context (only if any was found).
     
     Args:
         chunk: Text chunk to rewrite
         db: Personality database
-        extra_instructions: Optional extra instructions for rewriting
+        extra_instructions: Optional extra instructions for rewriting (already stripped)
+        use_cache: Reuse cached LLM outputs (results are cached either way)
     """
-    analysis = analyze_chunk(chunk)
-    role = analysis["rhetorical_role"]
-    retrieval_query = analysis["retrieval_query"]
-
-    context = retrieve_context(db, retrieval_query)
-
-    # Format extra instructions if provided
-    extra_instructions_text = ""
-    if extra_instructions and extra_instructions.strip():
-        extra_instructions_text = f"Additional Instructions:\n{extra_instructions.strip()}"
-
-    # If nothing retrieved, we still adapt style but avoid fake specifics.
-    adapted = llm.invoke(
-        REWRITE_PROMPT.format(
-            chunk=chunk,
-            context=context if context else "(no specific facts; stay vague but honest)",
-            rhetorical_role=role,
-            extra_instructions=extra_instructions_text,
-        )
-    ).content.strip()
+    [analysis] = await aanalyze_chunks([chunk], extra_instructions, use_cache)
+    # Chroma is synchronous; keep it off the event loop
+    context = await asyncio.to_thread(retrieve_context, db, analysis["retrieval_query"])
+    return await _afinish_chunk(chunk, analysis, context, extra_instructions, use_cache)
 
-    return adapted
 
+def rewrite_chunk(chunk: str, db, extra_instructions: str = "", use_cache: bool = True) -> str:
+    """Synchronous wrapper around arewrite_chunk."""
+    return _run_async(arewrite_chunk(chunk, db, extra_instructions, use_cache))
 
-def repurpose_script(input_file: str = "script.txt", output_file: str = "output.txt", extra_instructions: str = ""):
+
+async def arewrite_chunks(chunks: list, db, extra_instructions: str = "", use_cache: bool = True, on_result=None) -> list:
     """
-    Main function to repurpose a script by personalizing it.
+    Rewrite chunks: one streamed, batched analysis call; as analyses arrive,
+    retrieval (coalesced into as few batches as possible) and grounding run
+    concurrently, at most MAX_CONCURRENCY LLM calls at a time.
+    Chunks identical or near-identical to previously rewritten ones are
+    served from the caches, and chunks with no words are kept as-is,
+    without any LLM calls.
+    If given, on_result(index, rewritten_chunk) is called as each chunk finishes.
     
-    Args:
-        input_file: Path to input script file
-        output_file: Path to save personalized output
-        extra_instructions: Optional extra instructions for customizing the rewrite
+    Returns:
+        Rewritten chunks, in the same order as `chunks`
     """
-    print(f"\nLoading {input_file}...")
-    if not os.path.exists(input_file):
-        raise FileNotFoundError(f"{input_file} not found.")
+    variant = _cache_key(
+        "variant", ANALYSIS_MODEL, CHAT_MODEL, FUSED_SYSTEM, FUSED_PROMPT.template, GROUND_SYSTEM,
+        GROUND_PROMPT.template, REWRITE_SYSTEM, REWRITE_PROMPT.template, _personality_fingerprint(),
+        extra_instructions, ROLE_ROUTER,
+    )
+    keys = [_cache_key("line", variant, chunk) for chunk in chunks]
+    # Lines without a single word ("...", "—", emoji) are filler by definition:
+    # keep them as-is without embedding or analyzing them
+    results = [
+        (cache_get(key) if use_cache else None) if any(c.isalnum() for c in chunk) else chunk
+        for chunk, key in zip(chunks, keys)
+    ]
 
-    with open(input_file, "r", encoding="utf-8") as f:
-        script = f.read().strip()
+    # Exact-hash misses: embed them once and try the semantic cache
+    misses = [i for i, result in enumerate(results) if result is None]
+    vectors = await asyncio.to_thread(embed_queries, [chunks[i] for i in misses])
+    if use_cache:
+        hits = await asyncio.to_thread(semantic_cache_lookup, vectors, variant)
+        for i, hit in zip(misses, hits):
+            results[i] = hit
+    todo = [(i, vector) for i, vector in zip(misses, vectors) if results[i] is None]
+    if on_result:
+        for i, result in enumerate(results):
+            if result is not None:
+                on_result(i, result)
+    if not todo:
+        return results
 
-    if not script:
-        print(f"{input_file} is empty!")
-        return
+    todo_chunks = [chunks[i] for i, _ in todo]
+    if ROLE_ROUTER == "embedding":
+        roles = await asyncio.to_thread(route_roles, [vector for _, vector in todo])
+    else:
+        roles = [None] * len(todo)
 
-    db = load_db()
+    outputs = [None] * len(todo)
+    ctx_cache = {}
 
-    # Display extra instructions if provided
-    if extra_instructions and extra_instructions.strip():
-        print(f"\n📝 Extra Instructions: {extra_instructions.strip()}\n")
+    async def finish_one(k: int, analysis: dict, context: str):
+        async with _llm_slots():
+            outputs[k] = await _afinish_chunk(todo_chunks[k], analysis, context, extra_instructions, use_cache)
+        if on_result:
+            on_result(todo[k][0], outputs[k])
 
-    # Step 1: Use AI to structure the script into sections
-    sections = structure_script(script)
-    
-    print(f"\n{'='*60}")
-    print("REPURPOSING SCRIPT BY SECTION")
-    print(f"{'='*60}\n")
+    # Analyses queue up here as they stream in; None marks the end
+    arrivals = asyncio.Queue()
+    finishing = []
 
-    all_results = []
+    async def retrieve_arrivals():
+        # Each lookup covers everything that arrived while the previous one
+        # ran, so a streamed analysis still needs only a few embedding requests
+        done = False
+        while not done:
+            ready = await arrivals.get()
+            if ready is None:
+                return
+            while not arrivals.empty():
+                more = arrivals.get_nowait()
+                if more is None:
+                    done = True
+                    break
+                ready += more
+
+            # One embedding request + Chroma query for the lot; Chroma stays off the loop
+            contexts = await asyncio.to_thread(
+                retrieve_contexts, db, [analysis["retrieval_query"] for _, analysis in ready], ctx_cache=ctx_cache
+            )
+            finishing.extend(
+                asyncio.create_task(finish_one(k, a, ctx)) for (k, a), ctx in zip(ready, contexts)
+            )
+
+    retriever = asyncio.create_task(retrieve_arrivals())
+
+    # Lines routed to filler are kept as-is; the rest still need a retrieval
+    # query and draft from the analysis call
+    filler = [
+        (k, {"rhetorical_role": "filler", "retrieval_query": "none", "rewrite_draft": ""})
+        for k, role in enumerate(roles) if role == "filler"
+    ]
+    if filler:
+        arrivals.put_nowait(filler)
+    pending = [k for k, role in enumerate(roles) if role != "filler"]
+
+    # Finish lines while the rest of the analysis is still streaming in
+    try:
+        async for ready in astream_analyses([todo_chunks[k] for k in pending], extra_instructions, use_cache):
+            batch = []
+            for j, analysis in ready:
+                k = pending[j]
+                if roles[k]:
+                    analysis["rhetorical_role"] = roles[k]
+                batch.append((k, analysis))
+            arrivals.put_nowait(batch)
+        arrivals.put_nowait(None)
+        await retriever
+        await asyncio.gather(*finishing)
+    except BaseException:
+        # Don't leave retrieval/grounding running (and calling the LLM and
+        # on_result) on the shared loop after this call has failed
+        retriever.cancel()
+        await asyncio.gather(retriever, return_exceptions=True)
+        for task in finishing:
+            task.cancel()
+        await asyncio.gather(*finishing, return_exceptions=True)
+        raise
+
+    for (i, _), output in zip(todo, outputs):
+        results[i] = output
+        cache_set(keys[i], output)
+    await asyncio.to_thread(
+        semantic_cache_store, todo_chunks, [vector for _, vector in todo], outputs, variant
+    )
+    return results
+
+
+SCRIPT_CHUNK_SIZE = 200
+_SENT_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def _split_section(section_content: str, chunk_size: int = SCRIPT_CHUNK_SIZE) -> list:
+    """
+    Split a section's content into chunks to rewrite.
+    Short sections are one chunk. Longer ones are split into sentences,
+    which are packed into chunks of up to `chunk_size` chars (keeping the
+    original line breaks between them); single sentences longer than that
+    are wrapped at word boundaries.
+    """
+    if len(section_content) <= 300:
+        return [section_content]
+
+    chunks = []
+    for line in section_content.splitlines():
+        sep = "\n"
+        for sentence in _SENT_RE.split(line.strip()):
+            pieces = textwrap.wrap(sentence, chunk_size) if len(sentence) > chunk_size else [sentence]
+            for piece in filter(None, pieces):
+                if chunks and len(chunks[-1]) + 1 + len(piece) <= chunk_size:
+                    chunks[-1] += sep + piece
+                else:
+                    chunks.append(piece)
+                sep = " "
+    return chunks
+
+
+def _repurpose_sections(sections: list, db, extra_instructions: str = "", use_cache: bool = True, output_file: str = None, verbose: bool = True) -> list:
+    """
+    Rewrite every section of a structured script.
+    All chunks of all sections are analyzed in one batched call and then
+    rewritten concurrently.
     
-    # Process each section
+    Args:
+        sections: Section dictionaries with type, description, and content
+        db: Personality database
+        extra_instructions: Optional extra instructions for rewriting (already stripped)
+        use_cache: Reuse cached LLM outputs (False to force fresh generations)
+        output_file: If given, each section is written (and flushed) to
+            output_file + ".partial" as soon as it and every section before
+            it are done, so an interrupted run keeps its finished sections.
+            Only a complete run replaces output_file itself
+        verbose: Print each section's chunks before and after rewriting
+        
+    Returns:
+        One rewritten string per non-empty section
+    """
+    # Split every section up front so the whole script goes through one batch
+    planned = []
     for section_idx, section in enumerate(sections, 1):
-        section_type = section.get("type", "unknown")
-        section_description = section.get("description", "")
         section_content = section.get("content", "").strip()
+        if section_content:
+            planned.append((section_idx, section, _split_section(section_content)))
+
+    all_chunks = [chunk for _, _, chunks in planned for chunk in chunks]
+
+    on_result = None
+    out = open(f"{output_file}.partial", "w", encoding="utf-8") if output_file else None
+    if out:
+        section_of = [n for n, (_, _, chunks) in enumerate(planned) for _ in chunks]
+        starts = [0]
+        for _, _, chunks in planned:
+            starts.append(starts[-1] + len(chunks))
+        remaining = [len(chunks) for _, _, chunks in planned]
+        done = [None] * len(all_chunks)
+        next_section = 0
+
+        def on_result(i: int, adapted: str):
+            nonlocal next_section
+            if out.closed:
+                # The run already failed and returned; nothing left to write to
+                return
+            done[i] = adapted
+            remaining[section_of[i]] -= 1
+            # Write sections in order, as soon as each one is complete
+            while next_section < len(planned) and remaining[next_section] == 0:
+                if next_section:
+                    out.write("\n\n")
+                out.write(" ".join(done[starts[next_section]:starts[next_section + 1]]))
+                out.flush()
+                next_section += 1
+
+    try:
+        rewritten = iter(_run_async(
+            arewrite_chunks(all_chunks, db, extra_instructions, use_cache=use_cache, on_result=on_result)
+        ))
+    except BaseException:
+        if out:
+            print(f"\n⚠️  Stopped early; finished sections were kept in {out.name}")
+        raise
+    finally:
+        if out:
+            out.close()
+    if out:
+        # Keep the last complete output until this one is complete too
+        os.replace(out.name, output_file)
+
+    all_results = []
+    
+    # Report each section
+    for section_idx, section, chunks in planned:
+        section_results = [next(rewritten) for _ in chunks]
         
-        if not section_content:
+        # Join results for this section
+        all_results.append(" ".join(section_results))
+        
+        if not verbose:
             continue
         
+        section_type = section.get("type", "unknown")
+        section_description = section.get("description", "")
+        
         print(f"\n{'─'*60}")
         print(f"SECTION {section_idx}: [{section_type.upper()}]")
         if section_description:
             print(f"Description: {section_description}")
         print(f"{'─'*60}")
         
-        # For longer sections, split into sentences
-        # Otherwise, process as one chunk
-        if len(section_content) > 300:
-            # Split by sentences or newlines
-            splitter = CharacterTextSplitter(chunk_size=200, chunk_overlap=20, separator="\n")
-            chunks = [c.strip() for c in splitter.split_text(section_content) if c.strip()]
-        else:
-            chunks = [section_content]
-        
-        section_results = []
-        
-        for chunk_idx, chunk in enumerate(chunks, 1):
+        for chunk_idx, (chunk, adapted) in enumerate(zip(chunks, section_results), 1):
             print(f"\n  Chunk {chunk_idx}/{len(chunks)}:")
             print(f"  IN:  {chunk[:100]}{'...' if len(chunk) > 100 else ''}")
-            
-            adapted = rewrite_chunk(chunk, db, extra_instructions)
-            
-            section_results.append(adapted)
             print(f"  OUT: {adapted}")
         
-        # Join results for this section
-        section_output = " ".join(section_results)
-        all_results.append(section_output)
-        
         print(f"\n✅ Section {section_idx} complete")
+    
+    return all_results
+
+
+def prefetch_structure(input_file: str = "script.txt") -> list:
+    """
+    Read and structure a script without printing, so it can run in the
+    background (e.g. while the user types extra instructions).
+    
+    Args:
+        input_file: Path to input script file
+        
+    Returns:
+        List of section dictionaries (empty if the script is empty)
+    """
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"{input_file} not found.")
+
+    with open(input_file, "r", encoding="utf-8") as f:
+        script = f.read().strip()
+
+    if not script:
+        return []
+
+    return structure_script(script, verbose=False)
+
+
+def repurpose_script(input_file: str = "script.txt", output_file: str = "output.txt", extra_instructions: str = "", sections: list = None, db=None, use_cache: bool = True, verbose: bool = True) -> str:
+    """
+    Main function to repurpose a script by personalizing it.
+    
+    Args:
+        input_file: Path to input script file
+        output_file: Path to save personalized output
+        extra_instructions: Optional extra instructions for customizing the rewrite
+        sections: Pre-structured sections (from prefetch_structure); structured here if not given
+        db: Personality database (loaded if not given)
+        use_cache: Reuse cached LLM outputs (False when regenerating, to get a new variant)
+        verbose: Print progress and the result (False when several runs share the console)
+        
+    Returns:
+        The personalized script (None if the input is empty)
+    """
+    if verbose:
+        print(f"\nLoading {input_file}...")
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"{input_file} not found.")
+
+    with open(input_file, "r", encoding="utf-8") as f:
+        script = f.read().strip()
+
+    if not script:
+        print(f"{input_file} is empty!")
+        return
+
+    if db is None:
+        db = load_db()
+
+    # Normalize once so each chunk doesn't re-check/strip the instructions
+    extra_instructions = (extra_instructions or "").strip()
+    
+    # Display extra instructions if provided
+    if extra_instructions and verbose:
+        print(f"\n📝 Extra Instructions: {extra_instructions}\n")
+
+    # Step 1: Use AI to structure the script into sections
+    if sections:
+        if verbose:
+            print("\n🔍 Script structure (prefetched):")
+            print_sections(sections)
+    else:
+        sections = structure_script(script, verbose=verbose)
+    
+    if verbose:
+        print(f"\n{'='*60}")
+        print("REPURPOSING SCRIPT BY SECTION")
+        print(f"{'='*60}\n")
+
+    all_results = _repurpose_sections(sections, db, extra_instructions, use_cache, output_file=output_file, verbose=verbose)
 
     # Join all sections with double newlines for readability
     full_output = "\n\n".join(all_results)
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(full_output)
-
-    print(f"\n{'='*60}")
-    print(f"✅ FULL REPURPOSED SCRIPT SAVED TO: {output_file}")
-    print(f"{'='*60}\n")
-    print(full_output)
-    print(f"\n{'='*60}")
+    if verbose:
+        print(f"\n{'='*60}")
+        print(f"✅ FULL REPURPOSED SCRIPT SAVED TO: {output_file}")
+        print(f"{'='*60}\n")
+        print(full_output)
+        print(f"\n{'='*60}")
+    return full_output
 
 
 def analyze_script_only(input_file: str, output_dir: str = "analyzed_scripts") -> str:
@@ -475,7 +1531,7 @@ def analyze_script_only(input_file: str, output_dir: str = "analyzed_scripts") -
     return txt_output_path
 
 
-def repurpose_from_analyzed(analyzed_json_path: str, output_dir: str = "repurposed_scripts", extra_instructions: str = "") -> str:
+def repurpose_from_analyzed(analyzed_json_path: str, output_dir: str = "repurposed_scripts", extra_instructions: str = "", db=None, use_cache: bool = True) -> str:
     """
     Repurpose a script from an analyzed JSON file.
     Uses the structured sections from the analysis.
@@ -484,6 +1540,8 @@ def repurpose_from_analyzed(analyzed_json_path: str, output_dir: str = "repurpos
         analyzed_json_path: Path to the analyzed JSON file
         output_dir: Directory to save repurposed scripts
         extra_instructions: Optional extra instructions for customizing the rewrite
+        db: Personality database (loaded if not given)
+        use_cache: Reuse cached LLM outputs (False when regenerating, to get a new variant)
         
     Returns:
         Path to the saved repurposed script
@@ -506,62 +1564,20 @@ def repurpose_from_analyzed(analyzed_json_path: str, output_dir: str = "repurpos
     original_file = analysis_data.get("original_file", "unknown")
     print(f"✅ Loaded {len(sections)} section(s) from analysis")
     
-    db = load_db()
+    if db is None:
+        db = load_db()
+    
+    # Normalize once so each chunk doesn't re-check/strip the instructions
+    extra_instructions = (extra_instructions or "").strip()
     
     # Display extra instructions if provided
-    if extra_instructions and extra_instructions.strip():
-        print(f"\n📝 Extra Instructions: {extra_instructions.strip()}\n")
+    if extra_instructions:
+        print(f"\n📝 Extra Instructions: {extra_instructions}\n")
     
     print(f"\n{'='*60}")
     print("REPURPOSING SCRIPT BY SECTION")
     print(f"{'='*60}\n")
     
-    all_results = []
-    
-    # Process each section
-    for section_idx, section in enumerate(sections, 1):
-        section_type = section.get("type", "unknown")
-        section_description = section.get("description", "")
-        section_content = section.get("content", "").strip()
-        
-        if not section_content:
-            continue
-        
-        print(f"\n{'─'*60}")
-        print(f"SECTION {section_idx}: [{section_type.upper()}]")
-        if section_description:
-            print(f"Description: {section_description}")
-        print(f"{'─'*60}")
-        
-        # For longer sections, split into sentences
-        # Otherwise, process as one chunk
-        if len(section_content) > 300:
-            # Split by sentences or newlines
-            splitter = CharacterTextSplitter(chunk_size=200, chunk_overlap=20, separator="\n")
-            chunks = [c.strip() for c in splitter.split_text(section_content) if c.strip()]
-        else:
-            chunks = [section_content]
-        
-        section_results = []
-        
-        for chunk_idx, chunk in enumerate(chunks, 1):
-            print(f"\n  Chunk {chunk_idx}/{len(chunks)}:")
-            print(f"  IN:  {chunk[:100]}{'...' if len(chunk) > 100 else ''}")
-            
-            adapted = rewrite_chunk(chunk, db, extra_instructions)
-            
-            section_results.append(adapted)
-            print(f"  OUT: {adapted}")
-        
-        # Join results for this section
-        section_output = " ".join(section_results)
-        all_results.append(section_output)
-        
-        print(f"\n✅ Section {section_idx} complete")
-    
-    # Join all sections with double newlines for readability
-    full_output = "\n\n".join(all_results)
-    
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
@@ -574,9 +1590,11 @@ def repurpose_from_analyzed(analyzed_json_path: str, output_dir: str = "repurpos
     output_filename = f"{base_name}_repurposed_{timestamp}.txt"
     output_path = os.path.join(output_dir, output_filename)
     
-    # Save repurposed script
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(full_output)
+    # Repurpose, saving each section as it completes
+    all_results = _repurpose_sections(sections, db, extra_instructions, use_cache, output_file=output_path)
+    
+    # Join all sections with double newlines for readability
+    full_output = "\n\n".join(all_results)
     
     print(f"\n{'='*60}")
     print(f"✅ REPURPOSED SCRIPT SAVED TO: {output_path}")
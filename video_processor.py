@@ -1,20 +1,43 @@
 import os
+import sys
 import json
+import mmap
 import base64
+import asyncio
+import tempfile
+import subprocess
 from pathlib import Path
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterator, Tuple
 from dotenv import load_dotenv
 
 import cv2
-from scenedetect import detect, ContentDetector, split_video_ffmpeg
-from openai import OpenAI
+import numpy as np
+from scenedetect import open_video, SceneManager, ContentDetector, split_video_ffmpeg
+from openai import OpenAI, AsyncOpenAI
 
-load_dotenv()
+# Under main.py, script_repurposer has already loaded .env; run standalone, load it here.
+# Variables already set in the environment take precedence over .env.
+if "script_repurposer" not in sys.modules:
+    load_dotenv()
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 SCREENSHOTS_DIR = "screenshots"
 
+# Max GPT-4 Vision requests in flight at once
+VISION_CONCURRENCY = int(os.getenv("UGC_MAX_CONCURRENCY", "8"))
+
+def write_text_file(path: str, content: str):
+    """
+    Write text to a temp file and rename it over path, so an interrupted
+    write never leaves a truncated script behind.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
 def ensure_screenshots_dir():
     """Create screenshots directory if it doesn't exist."""
     os.makedirs(SCREENSHOTS_DIR, exist_ok=True)
@@ -33,7 +56,11 @@ def detect_scenes(video_path: str, threshold: float = 27.0) -> List[Dict]:
     print(f"\n🎬 Detecting scenes in {video_path}...")
     
     try:
-        scene_list = detect(video_path, ContentDetector(threshold=threshold))
+        video = open_video(video_path)
+        scene_manager = SceneManager()
+        scene_manager.add_detector(ContentDetector(threshold=threshold))
+        scene_manager.detect_scenes(video=video)
+        scene_list = scene_manager.get_scene_list()
     except Exception as e:
         print(f"❌ Error detecting scenes: {e}")
         print("💡 Tip: Make sure the video file is valid and not corrupted")
@@ -42,11 +69,7 @@ def detect_scenes(video_path: str, threshold: float = 27.0) -> List[Dict]:
     if not scene_list:
         print("⚠️  No scenes detected - treating entire video as one scene")
         # Fallback: create a single scene for entire video
-        cap = cv2.VideoCapture(video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = frame_count / fps if fps > 0 else 0
-        cap.release()
+        duration = video.duration.get_seconds()
         
         return [{
             "id": 1,
@@ -74,34 +97,37 @@ def detect_scenes(video_path: str, threshold: float = 27.0) -> List[Dict]:
 
 def format_timestamp(seconds: float) -> str:
     """Convert seconds to MM:SS format."""
-    mins = int(seconds // 60)
-    secs = int(seconds % 60)
+    mins, secs = divmod(int(seconds), 60)
     return f"{mins}:{secs:02d}"
 
-def extract_frame(video_path: str, timestamp: float, output_path: str):
-    """
-    Extract a single frame from video at given timestamp.
-    
-    Args:
-        video_path: Path to video file
-        timestamp: Time in seconds to extract frame
-        output_path: Where to save the screenshot
-    """
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_number = int(timestamp * fps)
-    
-    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-    ret, frame = cap.read()
-    
-    if ret:
-        cv2.imwrite(output_path, frame)
-    
-    cap.release()
+# Seek instead of decoding forward when the next wanted frame is further than this
+MAX_FORWARD_GRAB_SECONDS = 2.0
+
+# Screenshots only feed GPT-4 Vision, which doesn't need full resolution
+SCREENSHOT_MAX_SIDE = 768
+SCREENSHOT_JPEG_QUALITY = 80
+
+def encode_screenshot(frame) -> bytes:
+    """Downscale a frame to SCREENSHOT_MAX_SIDE (long edge) and encode it as a JPEG."""
+    height, width = frame.shape[:2]
+    scale = SCREENSHOT_MAX_SIDE / max(height, width)
+    if scale < 1:
+        frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, SCREENSHOT_JPEG_QUALITY])
+    if not ok:
+        raise ValueError("Could not encode frame as JPEG")
+    return jpeg.tobytes()
+
+def write_screenshot(frame, path: str):
+    """Encode a frame and write it to disk."""
+    jpeg = encode_screenshot(frame)
+    with open(path, "wb") as f:
+        f.write(jpeg)
 
 def extract_screenshots(video_path: str, scenes: List[Dict]) -> List[Dict]:
     """
     Extract a screenshot for each scene.
+    All frames are read in one forward-only pass with a FrameGrabber.
     
     Args:
         video_path: Path to video file
@@ -113,24 +139,108 @@ def extract_screenshots(video_path: str, scenes: List[Dict]) -> List[Dict]:
     print("\n📸 Extracting screenshots...")
     ensure_screenshots_dir()
     
+    targets = {}
+    
     for scene in scenes:
         # Extract frame from middle of scene for best representation
         mid_timestamp = (scene["start"] + scene["end"]) / 2
         screenshot_filename = f"scene_{scene['id']:03d}.jpg"
         screenshot_path = os.path.join(SCREENSHOTS_DIR, screenshot_filename)
-        
-        extract_frame(video_path, mid_timestamp, screenshot_path)
         scene["screenshot"] = screenshot_path
-        
-        print(f"  Scene {scene['id']}: {screenshot_path}")
+        targets.setdefault(mid_timestamp, []).append(scene)
+    
+    if targets:
+        # Decode on this thread; encode and write on worker threads (cv2
+        # releases the GIL while encoding)
+        with FrameGrabber(video_path) as grabber, ThreadPoolExecutor(max_workers=os.cpu_count()) as writer:
+            writes = []
+            for timestamp, frame in grabber.grab_sorted(targets):
+                for scene in targets[timestamp]:
+                    writes.append(writer.submit(write_screenshot, frame, scene["screenshot"]))
+                    print(f"  Scene {scene['id']}: {scene['screenshot']}")
+            for write in writes:
+                write.result()
     
     print("✅ Screenshots extracted")
     return scenes
 
+class FrameGrabber:
+    """
+    One open cv2.VideoCapture that hands out frames at many timestamps.
+    Timestamps are visited in ascending order: nearby frames are reached
+    with cap.grab() (no reopen or backward seek) and only the wanted frames
+    are decoded.
+    
+    Usage:
+        with FrameGrabber(video_path) as grabber:
+            for timestamp, frame in grabber.grab_sorted(timestamps):
+                ...
+    """
+    
+    def __init__(self, video_path: str):
+        self.cap = cv2.VideoCapture(video_path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.position = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.cap.release()
+    
+    def grab_sorted(self, timestamps: List[float]) -> Iterator[Tuple[float, np.ndarray]]:
+        """
+        Yield (timestamp, frame) for each timestamp, in ascending order.
+        Timestamps whose frame can't be read are skipped.
+        """
+        max_gap = int(MAX_FORWARD_GRAB_SECONDS * self.fps)
+        last_number, last_frame = None, None
+        
+        for timestamp in sorted(timestamps):
+            frame_number = int(timestamp * self.fps)
+            if frame_number == last_number:
+                yield timestamp, last_frame
+                continue
+            
+            if frame_number < self.position or frame_number - self.position > max_gap:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                self.position = frame_number
+            while self.position < frame_number and self.cap.grab():
+                self.position += 1
+            
+            ret, frame = self.cap.read()
+            if not ret:
+                continue
+            self.position += 1
+            last_number, last_frame = frame_number, frame
+            yield timestamp, frame
+
 def encode_image(image_path: str) -> str:
-    """Encode image to base64 for OpenAI API."""
+    """Encode image to base64 for OpenAI API (read through mmap, no extra copy of the file)."""
     with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+        with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return base64.b64encode(data).decode('utf-8')
+
+def _vision_messages(image_path: str) -> List[Dict]:
+    """Build the GPT-4 Vision request messages for a screenshot."""
+    base64_image = encode_image(image_path)
+    return [
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": "Describe this video frame in 1-2 sentences. Focus on: What is the person doing? What's the setting? What's the mood/energy? Keep it concise and factual."
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{base64_image}"
+                    }
+                }
+            ]
+        }
+    ]
 
 def describe_scene(image_path: str) -> str:
     """
@@ -143,27 +253,9 @@ def describe_scene(image_path: str) -> str:
         Description of the scene
     """
     try:
-        base64_image = encode_image(image_path)
-        
         response = client.chat.completions.create(
             model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Describe this video frame in 1-2 sentences. Focus on: What is the person doing? What's the setting? What's the mood/energy? Keep it concise and factual."
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ],
+            messages=_vision_messages(image_path),
             max_tokens=150
         )
         
@@ -172,9 +264,38 @@ def describe_scene(image_path: str) -> str:
         print(f"⚠️  Error describing scene: {e}")
         return "Unable to analyze scene"
 
+async def adescribe_scene(async_client: AsyncOpenAI, image_path: str) -> str:
+    """Async version of describe_scene."""
+    try:
+        response = await async_client.chat.completions.create(
+            model="gpt-4o",
+            messages=_vision_messages(image_path),
+            max_tokens=150
+        )
+        
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        print(f"⚠️  Error describing scene: {e}")
+        return "Unable to analyze scene"
+
+async def _adescribe_scenes(scenes: List[Dict]) -> List[str]:
+    """Describe the scenes' screenshots concurrently, at most VISION_CONCURRENCY at a time."""
+    sem = asyncio.Semaphore(VISION_CONCURRENCY)
+    
+    # The client retries 429s / transient errors itself, with exponential backoff
+    async with AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=5) as async_client:
+        async def describe_one(scene: Dict) -> str:
+            async with sem:
+                description = await adescribe_scene(async_client, scene["screenshot"])
+            print(f"  Scene {scene['id']}: {description[:80]}...")
+            return description
+        
+        return await asyncio.gather(*(describe_one(scene) for scene in scenes))
+
 def add_scene_descriptions(scenes: List[Dict]) -> List[Dict]:
     """
     Add visual descriptions to each scene using GPT-4 Vision.
+    All scenes are described concurrently.
     
     Args:
         scenes: List of scenes with screenshots
@@ -184,55 +305,92 @@ def add_scene_descriptions(scenes: List[Dict]) -> List[Dict]:
     """
     print("\n🔍 Analyzing scenes with GPT-4 Vision...")
     
-    for scene in scenes:
-        if "screenshot" in scene:
-            description = describe_scene(scene["screenshot"])
-            scene["description"] = description
-            print(f"  Scene {scene['id']}: {description[:80]}...")
+    with_screenshots = [scene for scene in scenes if "screenshot" in scene]
+    descriptions = asyncio.run(_adescribe_scenes(with_screenshots))
+    for scene, description in zip(with_screenshots, descriptions):
+        scene["description"] = description
     
     print("✅ Scene descriptions complete")
     return scenes
 
-def transcribe_audio(video_path: str) -> Dict:
+def extract_audio(video_path: str) -> str:
+    """
+    Extract the audio track as 16 kHz mono Opus, which is all Whisper needs
+    and typically 20-100x smaller than the video.
+    
+    Args:
+        video_path: Path to video file
+    
+    Returns:
+        Path to a temporary .ogg file (the caller deletes it)
+    """
+    fd, audio_path = tempfile.mkstemp(suffix=".ogg")
+    os.close(fd)
+    try:
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-i", video_path,
+             "-vn", "-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", "24k", audio_path],
+            check=True,
+        )
+    except BaseException:
+        os.remove(audio_path)
+        raise
+    return audio_path
+
+def transcribe_audio(video_path: str, word_timestamps: bool = False) -> Dict:
     """
     Transcribe audio from video using Whisper API.
     
     Args:
         video_path: Path to video file
+        word_timestamps: Also request per-word timestamps (slightly slower;
+            only needed to align dialogue to scenes)
     
     Returns:
         Transcription with timestamps
     """
     print("\n🎙️  Transcribing audio with Whisper...")
     
+    # Upload just the audio; fall back to the whole video without ffmpeg
+    try:
+        audio_path = extract_audio(video_path)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"⚠️  Couldn't extract audio with ffmpeg ({e}), uploading the video instead")
+        audio_path = None
+    
     try:
-        # Check file size (Whisper has 25MB limit)
-        file_size_mb = os.path.getsize(video_path) / (1024 * 1024)
-        if file_size_mb > 25:
-            print(f"⚠️  Warning: File size ({file_size_mb:.1f}MB) exceeds Whisper API limit (25MB)")
-            print("💡 Tip: Consider compressing the video or extracting audio separately")
+        if audio_path is None:
+            # Check file size (Whisper has 25MB limit)
+            file_size_mb = os.path.getsize(video_path) / (1024 * 1024)
+            if file_size_mb > 25:
+                print(f"⚠️  Warning: File size ({file_size_mb:.1f}MB) exceeds Whisper API limit (25MB)")
+                print("💡 Tip: Install ffmpeg so only the audio is uploaded")
         
-        with open(video_path, "rb") as audio_file:
+        with open(audio_path or video_path, "rb") as audio_file:
             transcript = client.audio.transcriptions.create(
                 model="whisper-1",
                 file=audio_file,
-                response_format="verbose_json"
+                response_format="verbose_json",
+                timestamp_granularities=["word", "segment"] if word_timestamps else ["segment"]
             )
         
         print("✅ Transcription complete")
         return transcript
     except Exception as e:
         print(f"❌ Error transcribing audio: {e}")
-        print("💡 Tip: If file is too large, try extracting audio as mp3 first")
         raise
+    finally:
+        if audio_path:
+            os.remove(audio_path)
 
 def align_transcript_to_scenes(scenes: List[Dict], transcript: Dict) -> List[Dict]:
     """
-    Match transcribed segments to their corresponding scenes.
+    Match transcribed dialogue to its scenes, word by word, so a segment
+    spanning a scene cut is split at the cut.
     
     Args:
         scenes: List of scenes with timestamps
-        transcript: Whisper transcript with segment timestamps
+        transcript: Whisper transcript with segment (and ideally word) timestamps
     
     Returns:
         Scenes with aligned dialogue
@@ -243,30 +401,43 @@ def align_transcript_to_scenes(scenes: List[Dict], transcript: Dict) -> List[Dic
     for scene in scenes:
         scene["dialogue"] = []
     
-    # Get segments with timestamps from transcript
-    if hasattr(transcript, 'segments') and transcript.segments:
-        segments = transcript.segments
-        
+    # Access as attributes, not dict keys
+    segments = getattr(transcript, 'segments', None) or []
+    words = getattr(transcript, 'words', None) or []
+    word_starts = np.fromiter((getattr(word, 'start', 0) for word in words), dtype=np.float64, count=len(words))
+    
+    # Every dialogue token with the time it was spoken
+    tokens = []
+    token_times = []
+    if segments:
         for segment in segments:
-            # Access as attributes, not dict keys
-            text = getattr(segment, 'text', '').strip()
-            start_time = getattr(segment, 'start', 0)
+            segment_tokens = getattr(segment, 'text', '').split()
+            segment_start = getattr(segment, 'start', 0)
+            segment_end = getattr(segment, 'end', segment_start)
             
-            # Find which scene this segment belongs to
-            for scene in scenes:
-                if scene["start"] <= start_time < scene["end"]:
-                    scene["dialogue"].append(text)
-                    break
-    elif hasattr(transcript, 'text'):
-        # Fallback: if no segments, split full text across scenes evenly
-        full_text = transcript.text
-        words = full_text.split()
-        words_per_scene = max(1, len(words) // len(scenes))
-        
-        for i, scene in enumerate(scenes):
-            start_idx = i * words_per_scene
-            end_idx = start_idx + words_per_scene if i < len(scenes) - 1 else len(words)
-            scene["dialogue"].append(" ".join(words[start_idx:end_idx]))
+            # Keep the segment's punctuated text, but time it word by word when
+            # the segment's words line up with its tokens
+            lo, hi = np.searchsorted(word_starts, [segment_start, segment_end])
+            if hi - lo == len(segment_tokens):
+                token_times.extend(word_starts[lo:hi])
+            else:
+                token_times.extend([segment_start] * len(segment_tokens))
+            tokens.extend(segment_tokens)
+    else:
+        tokens = [getattr(word, 'word', '').strip() for word in words]
+        token_times = word_starts
+    
+    # Bucket every token by time with one binary search over the (sorted)
+    # scene starts instead of scanning all scenes per token
+    scene_starts = np.fromiter((scene["start"] for scene in scenes), dtype=np.float64, count=len(scenes))
+    token_times = np.asarray(token_times, dtype=np.float64)
+    scene_indices = np.searchsorted(scene_starts, token_times, side="right") - 1
+    
+    for token, start_time, i in zip(tokens, token_times, scene_indices):
+        # Before the first scene, or in a gap after a scene's end
+        if i < 0 or start_time >= scenes[i]["end"]:
+            continue
+        scenes[i]["dialogue"].append(token)
     
     # Join dialogue for each scene
     for scene in scenes:
@@ -312,8 +483,8 @@ def process_video(video_path: str, output_json: str = "video_analysis.json") ->
         # Step 3: Describe scenes
         scenes = add_scene_descriptions(scenes)
         
-        # Step 4: Transcribe audio
-        transcript = transcribe_audio(video_path)
+        # Step 4: Transcribe audio (word timestamps for alignment)
+        transcript = transcribe_audio(video_path, word_timestamps=True)
         
         # Step 5: Align transcript to scenes
         scenes = align_transcript_to_scenes(scenes, transcript)
@@ -373,8 +544,7 @@ def transcribe_only(video_path: str, output_file: str = "script.txt") -> str:
             transcript_text = str(transcript).strip()
         
         # Save to file
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(transcript_text)
+        write_text_file(output_file, transcript_text)
         
         print(f"\n✅ Transcript saved to {output_file}")
         print(f"{'='*60}\n")
@@ -417,16 +587,13 @@ def scenes_to_script(scenes: List[Dict], output_file: str = "script.txt"):
     
     script_content = "\n".join(script_lines)
     
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(script_content)
+    write_text_file(output_file, script_content)
     
     print(f"📝 Script saved to {output_file}")
     return script_content
 
 if __name__ == "__main__":
     # Example usage
-    import sys
-    
     if len(sys.argv) < 2:
         print("Usage: python video_processor.py <video_path>")
         sys.exit(1)